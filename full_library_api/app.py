@@ -4,6 +4,11 @@ This module exposes a simple HTTP API with endpoints for authentication,
 authors, books and loans.  It uses only Python's standard library so
 that it can run in restricted environments without external packages.
 
+The endpoint handlers are plain functions that take a :class:`Request`
+and return a ``(status, payload)`` pair, so the same code is served by
+the ``http.server`` based :class:`APIServer` below and by the asyncio
+server in ``server.py``.
+
 All requests and responses use JSON.  Clients should include
 ``Content-Type: application/json`` when sending a request body.  For
 authenticated endpoints a header of the form ``Authorization: Token
@@ -12,570 +17,699 @@ authenticated endpoints a header of the form ``Authorization: Token
 
 from __future__ import annotations
 
-import json
+import re
+import traceback
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from http import HTTPStatus
-from http.server import BaseHTTPRequestHandler, HTTPServer
-from typing import Any, Dict, List, Optional, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
 from urllib.parse import urlparse
 
 import auth
-from models import Author, Book, Loan, User
+from models import ROLE_ANY, ROLE_STAFF, Author, Book, Loan, User
 import storage
 import utils
 
 
-class APIServer(BaseHTTPRequestHandler):
-    """HTTP request handler for the Library API."""
+# JSON codec shared with the data files: orjson when it is installed (it
+# returns bytes directly and is considerably faster), else the json module.
+_DUMPS = storage.dumps
+_LOADS = storage.loads
 
-    protocol_version = "HTTP/1.1"
+# Integer request fields must fit in a signed 64-bit integer
+_INT_MIN = -(2 ** 63)
+_INT_MAX = 2 ** 63 - 1
 
-    def _send_json(self, payload: Any, status: int = HTTPStatus.OK) -> None:
-        body = json.dumps(payload).encode("utf-8")
-        self.send_response(status)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(body)))
-        self.end_headers()
-        self.wfile.write(body)
 
-    def _parse_json_body(self) -> Optional[Dict[str, Any]]:
-        length = int(self.headers.get("Content-Length", 0))
-        if length == 0:
-            return None
-        body_bytes = self.rfile.read(length)
-        try:
-            return json.loads(body_bytes)
-        except json.JSONDecodeError:
-            return None
-
-    def _get_auth_user(self) -> Optional[User]:
-        """Return the authenticated user based on the Authorization header, or None."""
-        auth_header = self.headers.get("Authorization", "")
-        if auth_header.startswith("Token "):
-            token = auth_header[6:].strip()
-            return auth.get_user_by_token(token)
-        return None
+# Headers sent in reply to CORS preflight (OPTIONS) requests
+CORS_HEADERS = (
+    ("Access-Control-Allow-Origin", "*"),
+    ("Access-Control-Allow-Methods", "GET, POST, PUT, PATCH, DELETE, OPTIONS"),
+    ("Access-Control-Allow-Headers", "Content-Type, Authorization"),
+)
 
-    # Helper to parse path, returning (base_path, id_or_none)
-    def _parse_resource_path(self, path: str, prefix: str) -> Tuple[str, Optional[int]]:
-        """Return (base_path, id) where id may be None if not present."""
-        # ensure prefix ends with /
-        if not prefix.endswith("/"):
-            prefix = prefix + "/"
-        if not path.startswith(prefix):
-            return path, None
-        remainder = path[len(prefix):]
-        # if remainder is empty or '/', treat as list path
-        if remainder == "" or remainder == "/":
-            return prefix, None
-        # expect a number followed by '/'
-        parts = remainder.split('/')
-        try:
-            res_id = int(parts[0])
-            # ensure no extra path beyond id/
-            return prefix + f"{res_id}/", res_id
-        except ValueError:
-            return path, None
 
-    def do_OPTIONS(self) -> None:
-        # Allow CORS preflight if needed
-        self.send_response(HTTPStatus.NO_CONTENT)
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, PATCH, DELETE, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization")
-        self.end_headers()
+@dataclass
+class Request:
+    """Transport independent view of an incoming HTTP request.
 
-    def do_POST(self) -> None:
-        parsed = urlparse(self.path)
-        path = parsed.path
-
-        # Authentication endpoints
-        if path == "/api/auth/register/":
-            body = self._parse_json_body() or {}
-            username = body.get("username")
-            email = body.get("email")
-            password = body.get("password")
-            role = body.get("role", "MEMBER")
-            if not username or not email or not password:
-                self._send_json({"detail": "Missing fields", "code": "invalid"}, status=HTTPStatus.BAD_REQUEST)
-                return
-            user, error = auth.register_user(username, email, password, role)
-            if error == "username_taken":
-                self._send_json({"detail": "Username already exists", "code": "username_taken"}, status=HTTPStatus.BAD_REQUEST)
-                return
-            if error == "email_taken":
-                self._send_json({"detail": "Email already exists", "code": "email_taken"}, status=HTTPStatus.BAD_REQUEST)
-                return
-            # Success
-            user_summary = {"id": user.id, "username": user.username, "email": user.email, "role": user.role}
-            self._send_json(user_summary, status=HTTPStatus.CREATED)
-            return
-        if path == "/api/auth/login/":
-            body = self._parse_json_body() or {}
-            username = body.get("username")
-            password = body.get("password")
-            if not username or not password:
-                self._send_json({"detail": "Missing credentials", "code": "invalid"}, status=HTTPStatus.BAD_REQUEST)
-                return
-            token, error = auth.login(username, password)
-            if error:
-                # Invalid credentials
-                self._send_json({"detail": "Invalid username or password", "code": "invalid_credentials"}, status=HTTPStatus.UNAUTHORIZED)
-                return
-            self._send_json({"token": token})
-            return
-        if path == "/api/auth/logout/":
-            user = self._get_auth_user()
-            if not user:
-                self._send_json({"detail": "Authentication required", "code": "not_authenticated"}, status=HTTPStatus.UNAUTHORIZED)
-                return
-            # Extract token from header
-            token = self.headers.get("Authorization", "")[6:].strip() if self.headers.get("Authorization", "").startswith("Token ") else ""
-            if auth.logout(token):
-                # 204 No Content
-                self.send_response(HTTPStatus.NO_CONTENT)
-                self.end_headers()
-            else:
-                self._send_json({"detail": "Invalid token", "code": "invalid"}, status=HTTPStatus.UNAUTHORIZED)
-            return
+    Attributes:
+        method: request method, e.g. "GET".
+        path: URL path without the query string.
+        query: raw query string (may be empty).
+        headers: header values keyed by lower-cased header name.
+        body: raw request body (empty if none was sent).
+    """
 
-        # Loan borrow endpoint
-        if path == "/api/loans/borrow/":
-            user = self._get_auth_user()
-            if not auth.require_role(user, ["MEMBER", "LIBRARIAN", "ADMIN"]):
-                self._send_json({"detail": "Authentication required", "code": "not_authenticated"}, status=HTTPStatus.UNAUTHORIZED)
-                return
-            body = self._parse_json_body() or {}
-            book_id = body.get("book_id") or body.get("book")
-            if not book_id:
-                self._send_json({"detail": "Missing book_id", "code": "invalid"}, status=HTTPStatus.BAD_REQUEST)
-                return
-            try:
-                book_id = int(book_id)
-            except ValueError:
-                self._send_json({"detail": "Invalid book_id", "code": "invalid"}, status=HTTPStatus.BAD_REQUEST)
-                return
-            # Load data
-            books = storage.load_books()
-            book = next((b for b in books if b.id == book_id), None)
-            if not book:
-                self._send_json({"detail": "Book not found", "code": "not_found"}, status=HTTPStatus.NOT_FOUND)
-                return
-            if book.available_copies < 1:
-                self._send_json({"detail": "No copies available", "code": "no_copies"}, status=HTTPStatus.CONFLICT)
-                return
-            # Load loans
-            loans = storage.load_loans()
-            # Prevent duplicate active loans for same user+book
-            active_loan = next((l for l in loans if l.user_id == user.id and l.book_id == book_id and l.returned_at is None), None)
-            if active_loan:
-                self._send_json({"detail": "Book already borrowed by user", "code": "duplicate_loan"}, status=HTTPStatus.CONFLICT)
-                return
-            # Create loan
-            next_id = max([l.id for l in loans], default=0) + 1
-            now = datetime.utcnow()
-            due = now + timedelta(days=14)
-            new_loan = Loan(
-                id=next_id,
-                user_id=user.id,
-                book_id=book_id,
-                borrowed_at=now.isoformat(),
-                due_at=due.isoformat(),
-                returned_at=None,
-            )
-            loans.append(new_loan)
-            # Update book copies
-            book.available_copies -= 1
-            storage.save_books(books)
-            storage.save_loans(loans)
-            self._send_json(new_loan.__dict__, status=HTTPStatus.CREATED)
-            return
-        # Loan return endpoint
-        if path == "/api/loans/return/":
-            user = self._get_auth_user()
-            if not auth.require_role(user, ["MEMBER", "LIBRARIAN", "ADMIN"]):
-                self._send_json({"detail": "Authentication required", "code": "not_authenticated"}, status=HTTPStatus.UNAUTHORIZED)
-                return
-            body = self._parse_json_body() or {}
-            loan_id = body.get("loan_id")
-            book_id = body.get("book_id") or body.get("book")
-            # Load data
-            loans = storage.load_loans()
-            books = storage.load_books()
-            target_loan: Optional[Loan] = None
-            if loan_id is not None:
-                try:
-                    loan_id = int(loan_id)
-                    target_loan = next((l for l in loans if l.id == loan_id), None)
-                except ValueError:
-                    pass
-            elif book_id is not None:
-                try:
-                    book_id = int(book_id)
-                    target_loan = next((l for l in loans if l.book_id == book_id and l.user_id == user.id and l.returned_at is None), None)
-                except ValueError:
-                    pass
-            if not target_loan:
-                self._send_json({"detail": "Loan not found", "code": "not_found"}, status=HTTPStatus.NOT_FOUND)
-                return
-            # Permissions: user must own the loan or be staff
-            if target_loan.user_id != user.id and not auth.require_role(user, ["LIBRARIAN", "ADMIN"]):
-                self._send_json({"detail": "Forbidden", "code": "permission_denied"}, status=HTTPStatus.FORBIDDEN)
-                return
-            if target_loan.returned_at is not None:
-                self._send_json({"detail": "Loan already returned", "code": "already_returned"}, status=HTTPStatus.CONFLICT)
-                return
-            # Mark returned
-            now = datetime.utcnow().isoformat()
-            target_loan.returned_at = now
-            # Increment available copies
-            book = next((b for b in books if b.id == target_loan.book_id), None)
-            if book:
-                book.available_copies += 1
-                storage.save_books(books)
-            storage.save_loans(loans)
-            self._send_json(target_loan.__dict__)
-            return
+    method: str
+    path: str
+    query: str
+    headers: Dict[str, str]
+    body: bytes = b""
+
+
+# Handlers return (status, payload); a payload of None means an empty body
+# and a bytes payload is sent as already encoded JSON.
+Response = Tuple[int, Any]
+
+
+def _prebuilt_error(status: int, detail: str, code: str) -> Response:
+    return status, _DUMPS({"detail": detail, "code": code})
+
+
+# The most common error responses, encoded once at import
+_ERR: Dict[str, Response] = {
+    "not_found": _prebuilt_error(HTTPStatus.NOT_FOUND, "Not found", "not_found"),
+    "author_not_found": _prebuilt_error(HTTPStatus.NOT_FOUND, "Author not found", "not_found"),
+    "book_not_found": _prebuilt_error(HTTPStatus.NOT_FOUND, "Book not found", "not_found"),
+    "loan_not_found": _prebuilt_error(HTTPStatus.NOT_FOUND, "Loan not found", "not_found"),
+    "not_authenticated": _prebuilt_error(HTTPStatus.UNAUTHORIZED, "Authentication required", "not_authenticated"),
+    "permission_denied": _prebuilt_error(HTTPStatus.FORBIDDEN, "Forbidden", "permission_denied"),
+    "invalid_page": _prebuilt_error(HTTPStatus.BAD_REQUEST, "Invalid page or page_size", "invalid"),
+    "server_error": _prebuilt_error(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal server error", "server_error"),
+}
+
+
+def _parse_json_body(request: Request) -> Optional[Dict[str, Any]]:
+    """Return the request body as a JSON object, or None if it is not one."""
+    if not request.body:
+        return None
+    try:
+        body = _LOADS(request.body)
+    except ValueError:
+        # json.JSONDecodeError / orjson.JSONDecodeError, or undecodable bytes
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def _page_params(params: Mapping[str, str]) -> Optional[Tuple[int, int]]:
+    """Return (page, page_size) from the query, or None if either isn't an integer."""
+    try:
+        return int(params.get("page", 1) or 1), int(params.get("page_size", 10) or 10)
+    except ValueError:
+        return None
 
-        # Author create
-        if path == "/api/authors/":
-            # POST /api/authors/
-            user = self._get_auth_user()
-            if not auth.require_role(user, ["LIBRARIAN", "ADMIN"]):
-                self._send_json({"detail": "Authentication required", "code": "not_authenticated"}, status=HTTPStatus.UNAUTHORIZED)
-                return
-            body = self._parse_json_body() or {}
-            name = body.get("name")
-            if not name:
-                self._send_json({"detail": "Missing name", "code": "invalid"}, status=HTTPStatus.BAD_REQUEST)
-                return
-            authors = storage.load_authors()
-            next_id = max([a.id for a in authors], default=0) + 1
-            new_author = Author(id=next_id, name=name)
-            authors.append(new_author)
-            storage.save_authors(authors)
-            self._send_json(new_author.__dict__, status=HTTPStatus.CREATED)
-            return
 
-        # Books create
-        if path == "/api/books/":
-            user = self._get_auth_user()
-            if not auth.require_role(user, ["LIBRARIAN", "ADMIN"]):
-                self._send_json({"detail": "Authentication required", "code": "not_authenticated"}, status=HTTPStatus.UNAUTHORIZED)
-                return
-            body = self._parse_json_body() or {}
-            required_fields = ["title", "publication_year", "isbn", "author", "total_copies"]
-            if not all(field in body for field in required_fields):
-                self._send_json({"detail": "Missing fields", "code": "invalid"}, status=HTTPStatus.BAD_REQUEST)
-                return
-            # Validate and convert
-            try:
-                title = str(body["title"])
-                publication_year = int(body["publication_year"])
-                isbn = str(body["isbn"])
-                author_id = int(body["author"])
-                total_copies = int(body["total_copies"])
-                available_copies = int(body.get("available_copies", total_copies))
-            except (ValueError, TypeError):
-                self._send_json({"detail": "Invalid field types", "code": "invalid"}, status=HTTPStatus.BAD_REQUEST)
-                return
+def _int_field(value: Any) -> int:
+    """Convert a request field to int, raising ValueError if out of range."""
+    try:
+        number = int(value)
+    except OverflowError:  # float("inf")
+        raise ValueError("integer out of range") from None
+    if not _INT_MIN <= number <= _INT_MAX:
+        raise ValueError("integer out of range")
+    return number
+
+
+def _all_strings(*values: Any) -> bool:
+    """Return True if every value is a non-empty string."""
+    return all(isinstance(value, str) and value for value in values)
+
+
+def _get_auth_user(request: Request) -> Tuple[Optional[User], str]:
+    """Return (user, token) from the Authorization header.
+
+    user is None if the token is missing or unknown; token is "" if the
+    header is absent or not of the form ``Token <token>``.
+    """
+    auth_header = request.headers.get("authorization", "")
+    if auth_header.startswith("Token "):
+        token = auth_header[6:].strip()
+        return auth.get_user_by_token(token), token
+    return None, ""
+
+
+# Authentication endpoints
+
+def register(request: Request) -> Response:
+    """POST /api/auth/register/"""
+    body = _parse_json_body(request) or {}
+    username = body.get("username")
+    email = body.get("email")
+    password = body.get("password")
+    role = body.get("role", "MEMBER")
+    if not _all_strings(username, email, password):
+        return HTTPStatus.BAD_REQUEST, {"detail": "Missing fields", "code": "invalid"}
+    user, error = auth.register_user(username, email, password, role)
+    if error == "username_taken":
+        return HTTPStatus.BAD_REQUEST, {"detail": "Username already exists", "code": "username_taken"}
+    if error == "email_taken":
+        return HTTPStatus.BAD_REQUEST, {"detail": "Email already exists", "code": "email_taken"}
+    # Success
+    return HTTPStatus.CREATED, user.to_api_dict()
+
+
+def login(request: Request) -> Response:
+    """POST /api/auth/login/"""
+    body = _parse_json_body(request) or {}
+    username = body.get("username")
+    password = body.get("password")
+    if not _all_strings(username, password):
+        return HTTPStatus.BAD_REQUEST, {"detail": "Missing credentials", "code": "invalid"}
+    token, error = auth.login(username, password)
+    if error:
+        # Invalid credentials
+        return HTTPStatus.UNAUTHORIZED, {"detail": "Invalid username or password", "code": "invalid_credentials"}
+    return HTTPStatus.OK, {"token": token}
+
+
+def logout(request: Request) -> Response:
+    """POST /api/auth/logout/"""
+    user, token = _get_auth_user(request)
+    if not user:
+        return _ERR["not_authenticated"]
+    if auth.logout(token):
+        # 204 No Content
+        return HTTPStatus.NO_CONTENT, None
+    return HTTPStatus.UNAUTHORIZED, {"detail": "Invalid token", "code": "invalid"}
+
+
+# Author endpoints
+
+def list_authors(request: Request) -> Response:
+    """GET /api/authors/"""
+    params = utils.parse_query_params(request.query)
+    page_params = _page_params(params)
+    if page_params is None:
+        return _ERR["invalid_page"]
+    page, page_size = page_params
+    search = params.get("search", "")
+    ordering = params.get("ordering", "")
+    authors = storage.authors_table()
+    rows = utils.apply_author_search(authors, search)
+    rows = utils.apply_author_order(authors, rows, ordering, utils.page_limit(page, page_size))
+    paged, pagination = utils.paginate(rows, page, page_size)
+    # Represent authors as dicts
+    data = [authors.items[i].to_api_dict() for i in paged]
+    # Optionally include pagination meta
+    response = {
+        "results": data,
+        "count": pagination["count"],
+        "page": pagination["page"],
+        "page_size": pagination["page_size"],
+        "total_pages": pagination["total_pages"],
+    }
+    return HTTPStatus.OK, response
+
+
+def create_author(request: Request) -> Response:
+    """POST /api/authors/"""
+    user, _ = _get_auth_user(request)
+    if not auth.has_role(user, ROLE_STAFF):
+        return _ERR["not_authenticated"]
+    body = _parse_json_body(request) or {}
+    name = body.get("name")
+    if not _all_strings(name):
+        return HTTPStatus.BAD_REQUEST, {"detail": "Missing name", "code": "invalid"}
+    authors = storage.authors_table()
+    new_author = Author(id=authors.max_id + 1, name=name)
+    storage.save_authors([*authors.items, new_author])
+    return HTTPStatus.CREATED, new_author.to_api_dict()
+
+
+def get_author(request: Request, res_id: int) -> Response:
+    """GET /api/authors/{id}/"""
+    author = storage.authors_by_id().get(res_id)
+    if not author:
+        return _ERR["author_not_found"]
+    return HTTPStatus.OK, author.to_api_dict()
+
+
+def update_author(request: Request, res_id: int) -> Response:
+    """PUT/PATCH /api/authors/{id}/"""
+    user, _ = _get_auth_user(request)
+    if not auth.has_role(user, ROLE_STAFF):
+        return _ERR["permission_denied"]
+    body = _parse_json_body(request) or {}
+    authors = storage.authors_table()
+    author = authors.by_id.get(res_id)
+    if not author:
+        return _ERR["author_not_found"]
+    name = body.get("name")
+    if _all_strings(name):
+        author.name = name
+        storage.save_authors(authors.items)
+    return HTTPStatus.OK, author.to_api_dict()
+
+
+def delete_author(request: Request, res_id: int) -> Response:
+    """DELETE /api/authors/{id}/"""
+    user, _ = _get_auth_user(request)
+    if not auth.has_role(user, ROLE_STAFF):
+        return _ERR["permission_denied"]
+    authors = storage.authors_table()
+    if res_id not in authors.by_id:
+        return _ERR["author_not_found"]
+    # Remove and save
+    storage.save_authors([a for a in authors.items if a.id != res_id])
+    # 204 No Content
+    return HTTPStatus.NO_CONTENT, None
+
+
+# Book endpoints
+
+def list_books(request: Request) -> Response:
+    """GET /api/books/"""
+    params = utils.parse_query_params(request.query)
+    page_params = _page_params(params)
+    if page_params is None:
+        return _ERR["invalid_page"]
+    page, page_size = page_params
+    search = params.get("search", "")
+    ordering = params.get("ordering", "")
+    books = storage.books_table()
+    authors = storage.authors_table()
+    rows = utils.apply_book_search(books, authors, search)
+    rows = utils.apply_book_filters(books, rows, params)
+    rows = utils.apply_book_order(books, rows, ordering, utils.page_limit(page, page_size))
+    paged, pagination = utils.paginate(rows, page, page_size)
+    data = [books.items[i].to_api_dict() for i in paged]
+    response = {
+        "results": data,
+        "count": pagination["count"],
+        "page": pagination["page"],
+        "page_size": pagination["page_size"],
+        "total_pages": pagination["total_pages"],
+    }
+    return HTTPStatus.OK, response
+
+
+def create_book(request: Request) -> Response:
+    """POST /api/books/"""
+    user, _ = _get_auth_user(request)
+    if not auth.has_role(user, ROLE_STAFF):
+        return _ERR["not_authenticated"]
+    body = _parse_json_body(request) or {}
+    required_fields = ["title", "publication_year", "isbn", "author", "total_copies"]
+    if not all(field in body for field in required_fields):
+        return HTTPStatus.BAD_REQUEST, {"detail": "Missing fields", "code": "invalid"}
+    # Validate and convert
+    try:
+        title = str(body["title"])
+        publication_year = _int_field(body["publication_year"])
+        isbn = str(body["isbn"])
+        author_id = _int_field(body["author"])
+        total_copies = _int_field(body["total_copies"])
+        available_copies = _int_field(body.get("available_copies", total_copies))
+    except (ValueError, TypeError):
+        return HTTPStatus.BAD_REQUEST, {"detail": "Invalid field types", "code": "invalid"}
+    # Ensure author exists
+    if author_id not in storage.authors_by_id():
+        return HTTPStatus.BAD_REQUEST, {"detail": "Author not found", "code": "invalid_author"}
+    books = storage.books_table()
+    new_book = Book(
+        id=books.max_id + 1,
+        title=title,
+        publication_year=publication_year,
+        isbn=isbn,
+        author_id=author_id,
+        total_copies=total_copies,
+        available_copies=available_copies,
+    )
+    storage.save_books([*books.items, new_book])
+    return HTTPStatus.CREATED, new_book.to_api_dict()
+
+
+def get_book(request: Request, res_id: int) -> Response:
+    """GET /api/books/{id}/"""
+    book = storage.books_by_id().get(res_id)
+    if not book:
+        return _ERR["book_not_found"]
+    return HTTPStatus.OK, book.to_api_dict()
+
+
+def update_book(request: Request, res_id: int) -> Response:
+    """PUT/PATCH /api/books/{id}/"""
+    user, _ = _get_auth_user(request)
+    if not auth.has_role(user, ROLE_STAFF):
+        return _ERR["permission_denied"]
+    body = _parse_json_body(request) or {}
+    books = storage.books_table()
+    book = books.by_id.get(res_id)
+    if not book:
+        return _ERR["book_not_found"]
+    # Update fields if provided
+    if "title" in body:
+        book.title = str(body["title"])
+    if "publication_year" in body:
+        try:
+            book.publication_year = _int_field(body["publication_year"])
+        except (TypeError, ValueError):
+            pass
+    if "isbn" in body:
+        book.isbn = str(body["isbn"])
+    if "author" in body:
+        try:
+            author_id = _int_field(body["author"])
             # Ensure author exists
-            authors = storage.load_authors()
-            if not any(a.id == author_id for a in authors):
-                self._send_json({"detail": "Author not found", "code": "invalid_author"}, status=HTTPStatus.BAD_REQUEST)
-                return
-            books = storage.load_books()
-            next_id = max([b.id for b in books], default=0) + 1
-            new_book = Book(
-                id=next_id,
-                title=title,
-                publication_year=publication_year,
-                isbn=isbn,
-                author_id=author_id,
-                total_copies=total_copies,
-                available_copies=available_copies,
-            )
-            books.append(new_book)
-            storage.save_books(books)
-            self._send_json(new_book.__dict__, status=HTTPStatus.CREATED)
-            return
+            if author_id in storage.authors_by_id():
+                book.author_id = author_id
+        except (TypeError, ValueError):
+            pass
+    if "total_copies" in body:
+        try:
+            new_total = _int_field(body["total_copies"])
+            diff = new_total - book.total_copies
+            book.total_copies = new_total
+            book.available_copies = max(book.available_copies + diff, 0)
+        except (TypeError, ValueError):
+            pass
+    if "available_copies" in body:
+        try:
+            book.available_copies = _int_field(body["available_copies"])
+        except (TypeError, ValueError):
+            pass
+    storage.save_books(books.items)
+    return HTTPStatus.OK, book.to_api_dict()
+
+
+def delete_book(request: Request, res_id: int) -> Response:
+    """DELETE /api/books/{id}/"""
+    user, _ = _get_auth_user(request)
+    if not auth.has_role(user, ROLE_STAFF):
+        return _ERR["permission_denied"]
+    books = storage.books_table()
+    if res_id not in books.by_id:
+        return _ERR["book_not_found"]
+    storage.save_books([b for b in books.items if b.id != res_id])
+    return HTTPStatus.NO_CONTENT, None
+
+
+# Loan endpoints
+
+# How long a borrowed book may be kept before the loan becomes overdue.
+_LOAN_PERIOD = timedelta(days=14)
+
+
+def borrow_book(request: Request) -> Response:
+    """POST /api/loans/borrow/"""
+    user, _ = _get_auth_user(request)
+    if not auth.has_role(user, ROLE_ANY):
+        return _ERR["not_authenticated"]
+    body = _parse_json_body(request) or {}
+    book_id = body.get("book_id") or body.get("book")
+    if not book_id:
+        return HTTPStatus.BAD_REQUEST, {"detail": "Missing book_id", "code": "invalid"}
+    try:
+        book_id = int(book_id)
+    except (TypeError, ValueError):
+        return HTTPStatus.BAD_REQUEST, {"detail": "Invalid book_id", "code": "invalid"}
+    # Load data
+    books = storage.books_table()
+    book = books.by_id.get(book_id)
+    if not book:
+        return _ERR["book_not_found"]
+    if book.available_copies < 1:
+        return HTTPStatus.CONFLICT, {"detail": "No copies available", "code": "no_copies"}
+    # Prevent duplicate active loans for same user+book
+    loans = storage.loans_table()
+    if (user.id, book_id) in loans.active:
+        return HTTPStatus.CONFLICT, {"detail": "Book already borrowed by user", "code": "duplicate_loan"}
+    # Create loan
+    now = datetime.utcnow()
+    new_loan = Loan(
+        id=loans.max_id + 1,
+        user_id=user.id,
+        book_id=book_id,
+        borrowed_at=now.isoformat(),
+        due_at=(now + _LOAN_PERIOD).isoformat(),
+        returned_at=None,
+    )
+    # Update book copies
+    book.available_copies -= 1
+    storage.save_books(books.items)
+    storage.append_loan(new_loan)
+    return HTTPStatus.CREATED, new_loan.to_api_dict()
+
+
+def return_book(request: Request) -> Response:
+    """POST /api/loans/return/"""
+    user, _ = _get_auth_user(request)
+    if not auth.has_role(user, ROLE_ANY):
+        return _ERR["not_authenticated"]
+    body = _parse_json_body(request) or {}
+    loan_id = body.get("loan_id")
+    book_id = body.get("book_id") or body.get("book")
+    # Load data
+    loans = storage.loans_table()
+    target_loan: Optional[Loan] = None
+    if loan_id is not None:
+        try:
+            loan_id = int(loan_id)
+            target_loan = loans.by_id.get(loan_id)
+        except (TypeError, ValueError):
+            pass
+    elif book_id is not None:
+        try:
+            book_id = int(book_id)
+            target_loan = loans.active.get((user.id, book_id))
+        except (TypeError, ValueError):
+            pass
+    if not target_loan:
+        return _ERR["loan_not_found"]
+    # Permissions: user must own the loan or be staff
+    if target_loan.user_id != user.id and not auth.has_role(user, ROLE_STAFF):
+        return _ERR["permission_denied"]
+    if target_loan.returned_at is not None:
+        return HTTPStatus.CONFLICT, {"detail": "Loan already returned", "code": "already_returned"}
+    # Mark returned
+    target_loan.returned_at = datetime.utcnow().isoformat()
+    # Increment available copies
+    books = storage.books_table()
+    book = books.by_id.get(target_loan.book_id)
+    if book:
+        book.available_copies += 1
+        storage.save_books(books.items)
+    storage.mark_returned(target_loan)
+    return HTTPStatus.OK, target_loan.to_api_dict()
+
+
+def list_my_loans(request: Request) -> Response:
+    """GET /api/loans/mine/"""
+    user, _ = _get_auth_user(request)
+    if not user:
+        return _ERR["not_authenticated"]
+    params = utils.parse_query_params(request.query)
+    page_params = _page_params(params)
+    if page_params is None:
+        return _ERR["invalid_page"]
+    page, page_size = page_params
+    # Borrows extend the loans table in place, so it is read under the write
+    # lock to see every column at the same length.
+    with storage.write_lock:
+        loans = storage.loans_table()
+        # Filter to this user
+        rows = [i for i, user_id in enumerate(loans.user_ids) if user_id == user.id]
+        # Apply status and overdue filters
+        rows = utils.apply_loan_filters(loans, rows, params)
+        ordering = params.get("ordering", "")
+        rows = utils.apply_loan_order(loans, rows, ordering, utils.page_limit(page, page_size))
+        paged, pagination = utils.paginate(rows, page, page_size)
+        data = [loans.items[i].to_api_dict() for i in paged]
+    response = {
+        "results": data,
+        "count": pagination["count"],
+        "page": pagination["page"],
+        "page_size": pagination["page_size"],
+        "total_pages": pagination["total_pages"],
+    }
+    return HTTPStatus.OK, response
+
+
+def list_loans(request: Request) -> Response:
+    """GET /api/loans/"""
+    user, _ = _get_auth_user(request)
+    if not auth.has_role(user, ROLE_STAFF):
+        return _ERR["permission_denied"]
+    params = utils.parse_query_params(request.query)
+    page_params = _page_params(params)
+    if page_params is None:
+        return _ERR["invalid_page"]
+    page, page_size = page_params
+    with storage.write_lock:
+        loans = storage.loans_table()
+        rows = utils.apply_loan_filters(loans, range(len(loans.items)), params)
+        rows = utils.apply_loan_order(loans, rows, params.get("ordering", ""), utils.page_limit(page, page_size))
+        paged, pagination = utils.paginate(rows, page, page_size)
+        data = [loans.items[i].to_api_dict() for i in paged]
+    response = {
+        "results": data,
+        "count": pagination["count"],
+        "page": pagination["page"],
+        "page_size": pagination["page_size"],
+        "total_pages": pagination["total_pages"],
+    }
+    return HTTPStatus.OK, response
+
+
+def get_loan(request: Request, res_id: int) -> Response:
+    """GET /api/loans/{id}/"""
+    user, _ = _get_auth_user(request)
+    if not user:
+        return _ERR["not_authenticated"]
+    loan = storage.loans_by_id().get(res_id)
+    if not loan:
+        return _ERR["loan_not_found"]
+    if loan.user_id != user.id and not auth.has_role(user, ROLE_STAFF):
+        return _ERR["permission_denied"]
+    return HTTPStatus.OK, loan.to_api_dict()
+
+
+# Exact (method, path) routes
+_STATIC_ROUTES: Dict[Tuple[str, str], Callable[[Request], Response]] = {
+    ("POST", "/api/auth/register/"): register,
+    ("POST", "/api/auth/login/"): login,
+    ("POST", "/api/auth/logout/"): logout,
+    ("GET", "/api/authors/"): list_authors,
+    ("POST", "/api/authors/"): create_author,
+    ("GET", "/api/books/"): list_books,
+    ("POST", "/api/books/"): create_book,
+    ("POST", "/api/loans/borrow/"): borrow_book,
+    ("POST", "/api/loans/return/"): return_book,
+    ("GET", "/api/loans/mine/"): list_my_loans,
+    ("GET", "/api/loans/"): list_loans,
+}
+
+# Routes addressing a single resource; the captured ID is passed to the
+# handler.  PATCH is handled the same way as PUT.
+_AUTHOR_PATH = re.compile(r"/api/authors/(\d+)/?")
+_BOOK_PATH = re.compile(r"/api/books/(\d+)/?")
+_LOAN_PATH = re.compile(r"/api/loans/(\d+)/?")
+_PATTERNS: List[Tuple[re.Pattern, str, Callable[[Request, int], Response]]] = [
+    (_AUTHOR_PATH, "GET", get_author),
+    (_AUTHOR_PATH, "PUT", update_author),
+    (_AUTHOR_PATH, "PATCH", update_author),
+    (_AUTHOR_PATH, "DELETE", delete_author),
+    (_BOOK_PATH, "GET", get_book),
+    (_BOOK_PATH, "PUT", update_book),
+    (_BOOK_PATH, "PATCH", update_book),
+    (_BOOK_PATH, "DELETE", delete_book),
+    (_LOAN_PATH, "GET", get_loan),
+]
+
+
+def _route(request: Request) -> Response:
+    handler = _STATIC_ROUTES.get((request.method, request.path))
+    if handler is not None:
+        return handler(request)
+    for pattern, method, resource_handler in _PATTERNS:
+        if method == request.method:
+            match = pattern.fullmatch(request.path)
+            if match:
+                return resource_handler(request, int(match.group(1)))
+    return _ERR["not_found"]
+
+
+# Routes whose handlers hash a password.  The key derivation is slow on
+# purpose, so these run without storage.write_lock (the auth functions take
+# it around their own reads and writes) and server.py runs them off the
+# event loop.
+PASSWORD_ROUTES = frozenset({("POST", "/api/auth/register/"), ("POST", "/api/auth/login/")})
+
+
+def dispatch(request: Request) -> Tuple[int, bytes]:
+    """Run the handler for a request and return (status, encoded JSON body).
+
+    An exception in the handler is printed to stderr and answered with a
+    500 response, so both servers keep the connection usable.
+    """
+    try:
+        if request.method == "GET" or (request.method, request.path) in PASSWORD_ROUTES:
+            status, payload = _route(request)
+        else:
+            with storage.write_lock:
+                status, payload = _route(request)
+    except Exception:
+        traceback.print_exc()
+        return _ERR["server_error"]
+    if payload is None:
+        return status, b""
+    if isinstance(payload, bytes):
+        return status, payload
+    return status, _DUMPS(payload)
+
+
+_METHODS_WITH_BODY = frozenset({"POST", "PUT", "PATCH"})
+_JSON_RESPONSE_HEAD = (
+    b"HTTP/1.1 %d %s\r\nServer: %s\r\nDate: %s\r\n"
+    b"Content-Type: application/json\r\nContent-Length: %d\r\n\r\n"
+)
+_REASONS = {status.value: status.phrase.encode("ascii") for status in HTTPStatus}
 
-        # Default not found
-        self._send_json({"detail": "Not found", "code": "not_found"}, status=HTTPStatus.NOT_FOUND)
 
-    def do_GET(self) -> None:
-        parsed = urlparse(self.path)
-        path = parsed.path
-        query = parsed.query
-
-        # Authors list or detail
-        base, res_id = self._parse_resource_path(path, "/api/authors/")
-        if base.startswith("/api/authors/"):
-            if res_id is None:
-                # List authors
-                params = utils.parse_query_params(query)
-                page = int(params.get("page", 1) or 1)
-                page_size = int(params.get("page_size", 10) or 10)
-                search = params.get("search", "")
-                ordering = params.get("ordering", "")
-                authors = storage.load_authors()
-                authors = utils.apply_author_search(authors, search)
-                authors = utils.apply_author_order(authors, ordering)
-                paged, pagination = utils.paginate(authors, page, page_size)
-                # Represent authors as dicts
-                data = [a.__dict__ for a in paged]
-                # Optionally include pagination meta
-                response = {
-                    "results": data,
-                    "count": pagination["count"],
-                    "page": pagination["page"],
-                    "page_size": pagination["page_size"],
-                    "total_pages": pagination["total_pages"],
-                }
-                self._send_json(response)
-                return
-            else:
-                authors = storage.load_authors()
-                author = next((a for a in authors if a.id == res_id), None)
-                if not author:
-                    self._send_json({"detail": "Author not found", "code": "not_found"}, status=HTTPStatus.NOT_FOUND)
-                    return
-                self._send_json(author.__dict__)
-                return
-
-        # Books list or detail
-        base, res_id = self._parse_resource_path(path, "/api/books/")
-        if base.startswith("/api/books/"):
-            if res_id is None:
-                params = utils.parse_query_params(query)
-                page = int(params.get("page", 1) or 1)
-                page_size = int(params.get("page_size", 10) or 10)
-                search = params.get("search", "")
-                ordering = params.get("ordering", "")
-                books = storage.load_books()
-                authors = storage.load_authors()
-                books = utils.apply_book_search(books, authors, search)
-                books = utils.apply_book_filters(books, params)
-                books = utils.apply_book_order(books, ordering)
-                paged, pagination = utils.paginate(books, page, page_size)
-                data = [b.__dict__ for b in paged]
-                response = {
-                    "results": data,
-                    "count": pagination["count"],
-                    "page": pagination["page"],
-                    "page_size": pagination["page_size"],
-                    "total_pages": pagination["total_pages"],
-                }
-                self._send_json(response)
-                return
-            else:
-                books = storage.load_books()
-                book = next((b for b in books if b.id == res_id), None)
-                if not book:
-                    self._send_json({"detail": "Book not found", "code": "not_found"}, status=HTTPStatus.NOT_FOUND)
-                    return
-                self._send_json(book.__dict__)
-                return
-
-        # Loans endpoints
-        if path == "/api/loans/mine/":
-            user = self._get_auth_user()
-            if not user:
-                self._send_json({"detail": "Authentication required", "code": "not_authenticated"}, status=HTTPStatus.UNAUTHORIZED)
-                return
-            params = utils.parse_query_params(query)
-            page = int(params.get("page", 1) or 1)
-            page_size = int(params.get("page_size", 10) or 10)
-            status_filter = params.get("status")
-            overdue = params.get("overdue")
-            loans = storage.load_loans()
-            # Filter to this user
-            loans = [l for l in loans if l.user_id == user.id]
-            # Apply status and overdue filters
-            loans = utils.apply_loan_filters(loans, params)
-            ordering = params.get("ordering", "")
-            loans = utils.apply_loan_order(loans, ordering)
-            paged, pagination = utils.paginate(loans, page, page_size)
-            data = [loan.__dict__ | {"status": loan.status, "overdue": loan.is_overdue()} for loan in paged]
-            response = {
-                "results": data,
-                "count": pagination["count"],
-                "page": pagination["page"],
-                "page_size": pagination["page_size"],
-                "total_pages": pagination["total_pages"],
-            }
-            self._send_json(response)
-            return
+class APIServer(BaseHTTPRequestHandler):
+    """HTTP request handler for the Library API."""
 
-        # Staff list loans
-        if path == "/api/loans/":
-            user = self._get_auth_user()
-            if not auth.require_role(user, ["LIBRARIAN", "ADMIN"]):
-                self._send_json({"detail": "Forbidden", "code": "permission_denied"}, status=HTTPStatus.FORBIDDEN)
-                return
-            params = utils.parse_query_params(query)
-            page = int(params.get("page", 1) or 1)
-            page_size = int(params.get("page_size", 10) or 10)
-            loans = storage.load_loans()
-            loans = utils.apply_loan_filters(loans, params)
-            loans = utils.apply_loan_order(loans, params.get("ordering", ""))
-            paged, pagination = utils.paginate(loans, page, page_size)
-            data = [loan.__dict__ | {"status": loan.status, "overdue": loan.is_overdue()} for loan in paged]
-            response = {
-                "results": data,
-                "count": pagination["count"],
-                "page": pagination["page"],
-                "page_size": pagination["page_size"],
-                "total_pages": pagination["total_pages"],
-            }
-            self._send_json(response)
-            return
+    protocol_version = "HTTP/1.1"
 
-        # Get loan detail
-        base, res_id = self._parse_resource_path(path, "/api/loans/")
-        if base.startswith("/api/loans/") and res_id is not None:
-            user = self._get_auth_user()
-            if not user:
-                self._send_json({"detail": "Authentication required", "code": "not_authenticated"}, status=HTTPStatus.UNAUTHORIZED)
-                return
-            loans = storage.load_loans()
-            loan = next((l for l in loans if l.id == res_id), None)
-            if not loan:
-                self._send_json({"detail": "Loan not found", "code": "not_found"}, status=HTTPStatus.NOT_FOUND)
-                return
-            if loan.user_id != user.id and not auth.require_role(user, ["LIBRARIAN", "ADMIN"]):
-                self._send_json({"detail": "Forbidden", "code": "permission_denied"}, status=HTTPStatus.FORBIDDEN)
-                return
-            data = loan.__dict__ | {"status": loan.status, "overdue": loan.is_overdue()}
-            self._send_json(data)
+    def _send_json(self, body: bytes, status: int = HTTPStatus.OK) -> None:
+        if not body:
+            self._send_empty(status)
             return
+        # Build the status line and headers ourselves so that they go out
+        # with the body in a single write instead of one send per part.
+        self.log_request(status)
+        head = _JSON_RESPONSE_HEAD % (
+            status,
+            _REASONS.get(status, b""),
+            self.version_string().encode("latin-1"),
+            self.date_time_string().encode("latin-1"),
+            len(body),
+        )
+        self.wfile.write(head + body)
+
+    def _send_empty(self, status: int, extra_headers: Iterable[Tuple[str, str]] = ()) -> None:
+        """Send a response without a body.
+
+        An explicit ``Content-Length: 0`` lets HTTP/1.1 clients keep the
+        connection open instead of reading until it closes.
+        """
+        self.send_response(status)
+        for name, value in extra_headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        if not self.close_connection:
+            self.send_header("Connection", "keep-alive")
+        self.end_headers()
 
-        # Default not found
-        self._send_json({"detail": "Not found", "code": "not_found"}, status=HTTPStatus.NOT_FOUND)
-
-    def do_PUT(self) -> None:
+    def _handle(self) -> None:
         parsed = urlparse(self.path)
-        path = parsed.path
-
-        # Update author
-        base, res_id = self._parse_resource_path(path, "/api/authors/")
-        if base.startswith("/api/authors/") and res_id is not None:
-            user = self._get_auth_user()
-            if not auth.require_role(user, ["LIBRARIAN", "ADMIN"]):
-                self._send_json({"detail": "Forbidden", "code": "permission_denied"}, status=HTTPStatus.FORBIDDEN)
-                return
-            body = self._parse_json_body() or {}
-            authors = storage.load_authors()
-            author = next((a for a in authors if a.id == res_id), None)
-            if not author:
-                self._send_json({"detail": "Author not found", "code": "not_found"}, status=HTTPStatus.NOT_FOUND)
-                return
-            name = body.get("name")
-            if name:
-                author.name = name
-                storage.save_authors(authors)
-            self._send_json(author.__dict__)
-            return
+        # Always consume the body so it can't leak into the next request on
+        # a kept-alive connection, but only hand it on for methods that
+        # carry one; most requests have no Content-Length at all.
+        body = b""
+        length = self.headers.get("Content-Length")
+        if length:
+            body = self.rfile.read(int(length))
+            if self.command not in _METHODS_WITH_BODY:
+                body = b""
+        headers = {name.lower(): value for name, value in self.headers.items()}
+        request = Request(self.command, parsed.path, parsed.query, headers, body)
+        status, payload = dispatch(request)
+        self._send_json(payload, status=status)
 
-        # Update book
-        base, res_id = self._parse_resource_path(path, "/api/books/")
-        if base.startswith("/api/books/") and res_id is not None:
-            user = self._get_auth_user()
-            if not auth.require_role(user, ["LIBRARIAN", "ADMIN"]):
-                self._send_json({"detail": "Forbidden", "code": "permission_denied"}, status=HTTPStatus.FORBIDDEN)
-                return
-            body = self._parse_json_body() or {}
-            books = storage.load_books()
-            book = next((b for b in books if b.id == res_id), None)
-            if not book:
-                self._send_json({"detail": "Book not found", "code": "not_found"}, status=HTTPStatus.NOT_FOUND)
-                return
-            # Update fields if provided
-            if "title" in body:
-                book.title = str(body["title"])
-            if "publication_year" in body:
-                try:
-                    book.publication_year = int(body["publication_year"])
-                except (TypeError, ValueError):
-                    pass
-            if "isbn" in body:
-                book.isbn = str(body["isbn"])
-            if "author" in body:
-                try:
-                    author_id = int(body["author"])
-                    # Ensure author exists
-                    authors = storage.load_authors()
-                    if any(a.id == author_id for a in authors):
-                        book.author_id = author_id
-                except (TypeError, ValueError):
-                    pass
-            if "total_copies" in body:
-                try:
-                    new_total = int(body["total_copies"])
-                    diff = new_total - book.total_copies
-                    book.total_copies = new_total
-                    book.available_copies = max(book.available_copies + diff, 0)
-                except (TypeError, ValueError):
-                    pass
-            if "available_copies" in body:
-                try:
-                    book.available_copies = int(body["available_copies"])
-                except (TypeError, ValueError):
-                    pass
-            storage.save_books(books)
-            self._send_json(book.__dict__)
-            return
+    def do_OPTIONS(self) -> None:
+        # Allow CORS preflight if needed
+        self._send_empty(HTTPStatus.NO_CONTENT, CORS_HEADERS)
 
-        # No match
-        self._send_json({"detail": "Not found", "code": "not_found"}, status=HTTPStatus.NOT_FOUND)
+    def do_GET(self) -> None:
+        self._handle()
+
+    def do_POST(self) -> None:
+        self._handle()
+
+    def do_PUT(self) -> None:
+        self._handle()
 
     def do_PATCH(self) -> None:
-        # For simplicity, handle PATCH same as PUT
-        self.do_PUT()
+        self._handle()
 
     def do_DELETE(self) -> None:
-        parsed = urlparse(self.path)
-        path = parsed.path
-        # Delete author
-        base, res_id = self._parse_resource_path(path, "/api/authors/")
-        if base.startswith("/api/authors/") and res_id is not None:
-            user = self._get_auth_user()
-            if not auth.require_role(user, ["LIBRARIAN", "ADMIN"]):
-                self._send_json({"detail": "Forbidden", "code": "permission_denied"}, status=HTTPStatus.FORBIDDEN)
-                return
-            authors = storage.load_authors()
-            if not any(a.id == res_id for a in authors):
-                self._send_json({"detail": "Author not found", "code": "not_found"}, status=HTTPStatus.NOT_FOUND)
-                return
-            # Remove and save
-            authors = [a for a in authors if a.id != res_id]
-            storage.save_authors(authors)
-            # 204 No Content
-            self.send_response(HTTPStatus.NO_CONTENT)
-            self.end_headers()
-            return
-        # Delete book
-        base, res_id = self._parse_resource_path(path, "/api/books/")
-        if base.startswith("/api/books/") and res_id is not None:
-            user = self._get_auth_user()
-            if not auth.require_role(user, ["LIBRARIAN", "ADMIN"]):
-                self._send_json({"detail": "Forbidden", "code": "permission_denied"}, status=HTTPStatus.FORBIDDEN)
-                return
-            books = storage.load_books()
-            book = next((b for b in books if b.id == res_id), None)
-            if not book:
-                self._send_json({"detail": "Book not found", "code": "not_found"}, status=HTTPStatus.NOT_FOUND)
-                return
-            books = [b for b in books if b.id != res_id]
-            storage.save_books(books)
-            self.send_response(HTTPStatus.NO_CONTENT)
-            self.end_headers()
-            return
-        # Delete loan – not allowed via API (loans are only returned)
-        self._send_json({"detail": "Not found", "code": "not_found"}, status=HTTPStatus.NOT_FOUND)
+        self._handle()
 
 
-def run(server_class=HTTPServer, handler_class=APIServer, host: str = "127.0.0.1", port: int = 8000) -> None:
+def run(server_class=ThreadingHTTPServer, handler_class=APIServer, host: str = "127.0.0.1", port: int = 8000) -> None:
     server = server_class((host, port), handler_class)
     print(f"Library API server running on {host}:{port}")
     try:
@@ -587,4 +721,4 @@ def run(server_class=HTTPServer, handler_class=APIServer, host: str = "127.0.0.1
 
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    run()
@@ -1,11 +1,14 @@
 """Authentication and authorization helpers.
 
 This module implements user registration, login and token management
-without any external dependencies.  Passwords are hashed using SHA‑256
-and authentication tokens are generated using the ``secrets`` module.
-
-Tokens are stored in a JSON file (via ``storage.load_tokens`` and
-``storage.save_tokens``).  When a user logs in, a new token is created
+without any external dependencies.  Passwords are hashed with scrypt
+using a random per-user salt, and authentication tokens are generated
+using the ``secrets`` module.  Users still holding an unsalted SHA‑256
+hash from older versions are moved to scrypt when they next log in.
+
+Tokens are stored in a JSON file (via ``storage.load_tokens``, with
+logins and logouts journaled by ``storage.append_token`` and
+``storage.remove_token``).  When a user logs in, a new token is created
 and associated with their user ID.  The token must be provided as
 ``Authorization: Token <token>`` in subsequent API requests.
 """
@@ -13,17 +16,55 @@ and associated with their user ID.  The token must be provided as
 from __future__ import annotations
 
 import hashlib
+import hmac
 import secrets
-from typing import Optional, Tuple
+import threading
+from typing import Dict, Iterable, Optional, Tuple
 
-from models import User
+from models import ROLES, User
 import storage
 
 
-def _hash_password(password: str) -> str:
+# User IDs resolved from tokens, so that authenticated requests don't need
+# to consult the token table.  Entries are added on login or on the first
+# lookup of a token and removed on logout; tokens revoked by editing
+# tokens.json directly stay valid until the server restarts.  The user
+# itself is looked up in the users table on every request, so edits to
+# users.json (a changed role, a deleted user) apply at once.  Reads are
+# lock free (dict lookups are atomic); the lock orders cache writes with
+# the token file updates so a logout can't be undone by a concurrent lookup.
+_TOKEN_CACHE: Dict[str, int] = {}
+_TOKEN_CACHE_LOCK = threading.Lock()
+
+
+# scrypt cost parameters (about 16 MiB and a few tens of milliseconds per
+# hash).  The KDF only runs on register and login, outside
+# storage.write_lock; authenticated requests are resolved through the
+# token cache.
+_SCRYPT_N = 2 ** 14
+_SCRYPT_R = 8
+_SCRYPT_P = 1
+# Salt hashed against when the username is unknown, so that a failed login
+# takes as long whether or not the account exists.
+_DUMMY_SALT = "00" * 16
+
+
+def _hash_password(password: str, salt: str) -> str:
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=bytes.fromhex(salt), n=_SCRYPT_N, r=_SCRYPT_R, p=_SCRYPT_P, dklen=32
+    ).hex()
+
+
+def _legacy_hash_password(password: str) -> str:
     return hashlib.sha256(password.encode("utf-8")).hexdigest()
 
 
+def _check_password(user: User, password: str) -> bool:
+    if not user.salt:
+        return hmac.compare_digest(user.password_hash, _legacy_hash_password(password))
+    return hmac.compare_digest(user.password_hash, _hash_password(password, user.salt))
+
+
 def register_user(username: str, email: str, password: str, role: str = "MEMBER") -> Tuple[Optional[User], Optional[str]]:
     """Register a new user.
 
@@ -31,28 +72,57 @@ def register_user(username: str, email: str, password: str, role: str = "MEMBER"
     describing why registration failed.  Usernames and emails must be
     unique.  Passwords are hashed before storage.
     """
-    users = storage.load_users()
-    if any(u.username.lower() == username.lower() for u in users):
-        return None, "username_taken"
-    if any(u.email.lower() == email.lower() for u in users):
-        return None, "email_taken"
-    # Compute next ID
-    next_id = max([u.id for u in users], default=0) + 1
-    password_hash = _hash_password(password)
-    new_user = User(id=next_id, username=username, email=email, password_hash=password_hash, role=role.upper())
-    users.append(new_user)
-    storage.save_users(users)
+    error = _registration_conflict(username, email)
+    if error:
+        return None, error
+    salt = secrets.token_hex(16)
+    password_hash = _hash_password(password, salt)
+    with storage.write_lock:
+        # Check again: another registration may have saved while hashing
+        error = _registration_conflict(username, email)
+        if error:
+            return None, error
+        new_user = User(
+            id=storage.next_user_id(),
+            username=username,
+            email=email,
+            password_hash=password_hash,
+            role=role,
+            salt=salt,
+        )
+        storage.save_users([*storage.load_users(), new_user])
     return new_user, None
 
 
+def _registration_conflict(username: str, email: str) -> Optional[str]:
+    users = storage.users_table()
+    if username.lower() in users.by_username:
+        return "username_taken"
+    if email.lower() in users.by_email:
+        return "email_taken"
+    return None
+
+
 def authenticate_user(username: str, password: str) -> Optional[User]:
     """Return the user object if the username and password are correct, else None."""
-    users = storage.load_users()
-    password_hash = _hash_password(password)
-    for u in users:
-        if u.username.lower() == username.lower() and u.password_hash == password_hash:
-            return u
-    return None
+    user = storage.users_table().by_username.get(username.lower())
+    if user is None:
+        _hash_password(password, _DUMMY_SALT)
+        return None
+    if not _check_password(user, password):
+        return None
+    if not user.salt:
+        # Upgrade a legacy SHA-256 hash now that we know the password
+        legacy_hash = user.password_hash
+        salt = secrets.token_hex(16)
+        password_hash = _hash_password(password, salt)
+        with storage.write_lock:
+            user = storage.users_table().by_id.get(user.id, user)
+            if not user.salt and user.password_hash == legacy_hash:
+                user.salt = salt
+                user.password_hash = password_hash
+                storage.save_users(storage.load_users())
+    return user
 
 
 def login(username: str, password: str) -> Tuple[Optional[str], Optional[str]]:
@@ -65,38 +135,53 @@ def login(username: str, password: str) -> Tuple[Optional[str], Optional[str]]:
     user = authenticate_user(username, password)
     if not user:
         return None, "invalid_credentials"
-    tokens = storage.load_tokens()
-    # Generate a token that isn't already in use
-    token: str
-    while True:
-        token = secrets.token_hex(16)
-        if token not in tokens:
-            break
-    tokens[token] = user.id
-    storage.save_tokens(tokens)
+    # 128 random bits: a collision with an existing token is not a concern
+    token = secrets.token_hex(16)
+    # Take the locks in the order the mutating handlers do (write_lock is
+    # held by dispatch around logout)
+    with storage.write_lock, _TOKEN_CACHE_LOCK:
+        storage.append_token(token, user.id)
+        _TOKEN_CACHE[token] = user.id
     return token, None
 
 
 def logout(token: str) -> bool:
     """Invalidate a token.  Returns True if the token existed and was removed."""
-    tokens = storage.load_tokens()
-    if token in tokens:
-        tokens.pop(token)
-        storage.save_tokens(tokens)
-        return True
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE.pop(token, None)
+        tokens = storage.load_tokens()
+        if token in tokens:
+            storage.remove_token(token)
+            return True
     return False
 
 
 def get_user_by_token(token: str) -> Optional[User]:
     """Return the User associated with a given token, or None if not found."""
-    tokens = storage.load_tokens()
-    user_id = tokens.get(token)
-    if user_id is None:
-        return None
-    users = storage.load_users()
-    return next((u for u in users if u.id == user_id), None)
+    user_id = _TOKEN_CACHE.get(token)
+    if user_id is not None:
+        return storage.users_table().by_id.get(user_id)
+    with _TOKEN_CACHE_LOCK:
+        tokens, users_by_id = storage.load_auth_context()
+        user_id = tokens.get(token)
+        if user_id is None:
+            return None
+        _TOKEN_CACHE[token] = user_id
+    return users_by_id.get(user_id)
+
+
+def has_role(user: Optional[User], mask: int) -> bool:
+    """Return True if the user is authenticated and its role bit is in mask."""
+    return user is not None and user.role_mask & mask != 0
 
 
-def require_role(user: Optional[User], roles: list[str]) -> bool:
-    """Return True if the user is authenticated and has a role in roles."""
-    return user is not None and user.role.upper() in [r.upper() for r in roles]
+def require_role(user: Optional[User], roles: Iterable[str]) -> bool:
+    """Return True if the user is authenticated and has a role in roles.
+
+    Handlers use has_role with the precomputed ROLE_* masks; this wrapper
+    accepts role names in any case and any collection, frozensets included.
+    """
+    mask = 0
+    for role in roles:
+        mask |= ROLES.get(role.upper(), 0)
+    return has_role(user, mask)
@@ -4,16 +4,48 @@ We define simple dataclasses to model Users, Authors, Books and Loans.  These
 dataclasses are used by the application server to store and manipulate
 objects loaded from JSON storage.  Where appropriate we include helper
 methods for updating status or computing derived values.
+
+The classes use ``__slots__`` to keep the cached collections small, and
+each provides ``to_api_dict`` to build its JSON representation explicitly.
 """
 
 from __future__ import annotations
 
+import time
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def epoch_micros(timestamp: str) -> int:
+    """Return an ISO timestamp as whole microseconds since the Unix epoch.
+
+    Timestamps without a UTC offset are taken to be UTC, which is how the
+    loan endpoints write them.
+    """
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return (moment - _EPOCH) // _MICROSECOND
+
+
+def utc_now_micros() -> int:
+    """Return the current UTC time in microseconds since the Unix epoch."""
+    return time.time_ns() // 1000
+
 
+# Bit for each role; a user's role_mask has the bit of its role set, so a
+# permission check is a single AND against the mask of allowed roles.
+ROLES: Dict[str, int] = {"MEMBER": 1, "LIBRARIAN": 2, "ADMIN": 4}
+ROLE_STAFF = ROLES["LIBRARIAN"] | ROLES["ADMIN"]
+ROLE_ANY = ROLES["MEMBER"] | ROLE_STAFF
 
-@dataclass
+
+@dataclass(slots=True)
 class User:
     """Representation of an API user.
 
@@ -21,8 +53,15 @@ class User:
         id: unique integer identifier.
         username: unique username.
         email: email address.
-        password_hash: SHA‑256 hash of the user's password.
-        role: one of "MEMBER", "LIBRARIAN" or "ADMIN".
+        password_hash: scrypt hash of the user's password (hex).  Accounts
+            created before salts were introduced hold an unsalted SHA‑256
+            hash until their next login.
+        role: one of "MEMBER", "LIBRARIAN" or "ADMIN" (uppercased on
+            construction).
+        salt: per-user random salt (hex) for password_hash; empty for
+            legacy SHA‑256 hashes.
+        role_mask: the ROLES bit of role, derived on construction and not
+            stored.
     """
 
     id: int
@@ -30,16 +69,29 @@ class User:
     email: str
     password_hash: str
     role: str  # MEMBER, LIBRARIAN or ADMIN
+    salt: str = ""
+    role_mask: int = field(init=False, repr=False, compare=False, default=0)
+
+    def __post_init__(self) -> None:
+        self.role = self.role.upper()
+        self.role_mask = ROLES.get(self.role, 0)
+
+    def to_api_dict(self) -> Dict[str, Any]:
+        """Return the public fields of the user (everything but the password hash)."""
+        return {"id": self.id, "username": self.username, "email": self.email, "role": self.role}
 
 
-@dataclass
+@dataclass(slots=True)
 class Author:
     """Represents an author of one or more books."""
     id: int
     name: str
 
+    def to_api_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "name": self.name}
 
-@dataclass
+
+@dataclass(slots=True)
 class Book:
     """Represents a book in the library."""
     id: int
@@ -50,24 +102,57 @@ class Book:
     total_copies: int
     available_copies: int
 
+    def to_api_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "publication_year": self.publication_year,
+            "isbn": self.isbn,
+            "author_id": self.author_id,
+            "total_copies": self.total_copies,
+            "available_copies": self.available_copies,
+        }
+
 
-@dataclass
+@dataclass(slots=True)
 class Loan:
-    """Represents a borrowing transaction between a user and a book."""
+    """Represents a borrowing transaction between a user and a book.
+
+    borrowed_micros and due_micros hold borrowed_at and due_at as epoch
+    microseconds.  They are parsed once on construction (the timestamps
+    never change afterwards) and are not stored.
+    """
     id: int
     user_id: int
     book_id: int
     borrowed_at: str  # ISO format datetime
     due_at: str       # ISO format datetime
     returned_at: Optional[str] = None  # ISO format datetime or None
+    borrowed_micros: int = field(init=False, repr=False, compare=False, default=0)
+    due_micros: int = field(init=False, repr=False, compare=False, default=0)
+
+    def __post_init__(self) -> None:
+        self.borrowed_micros = epoch_micros(self.borrowed_at)
+        self.due_micros = epoch_micros(self.due_at)
 
     def is_overdue(self) -> bool:
         """Return True if the loan is overdue (due date in the past and not yet returned)."""
-        if self.returned_at is not None:
-            return False
-        return datetime.fromisoformat(self.due_at) < datetime.utcnow()
+        return self.returned_at is None and self.due_micros < utc_now_micros()
 
     @property
     def status(self) -> str:
         """Human readable status: BORROWED or RETURNED."""
         return "RETURNED" if self.returned_at is not None else "BORROWED"
+
+    def to_api_dict(self) -> Dict[str, Any]:
+        """Return the loan as exposed by the loan endpoints, with status and overdue flag."""
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "book_id": self.book_id,
+            "borrowed_at": self.borrowed_at,
+            "due_at": self.due_at,
+            "returned_at": self.returned_at,
+            "status": self.status,
+            "overdue": self.is_overdue(),
+        }
@@ -0,0 +1,181 @@
+"""Asynchronous HTTP server for the library management system.
+
+This is an alternative to the ``http.server`` based server in ``app.py``
+for deployments that need more throughput.  Connections are handled on
+an asyncio event loop (``uvloop`` when it is installed) and requests
+are parsed by ``httptools``, so no per-byte work happens in Python.
+Parsed requests are passed to ``app.dispatch`` and therefore share all
+endpoint handlers with ``app.py``.
+
+Unlike the rest of the package this module needs the third party
+``httptools`` package (and optionally ``uvloop``)::
+
+    pip install httptools uvloop
+    python server.py
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import traceback
+from collections import deque
+from http import HTTPStatus
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+import httptools
+
+try:
+    import uvloop
+except ImportError:  # fall back to the default asyncio event loop
+    uvloop = None
+
+import app
+
+
+_RESPONSE_HEAD = b"HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n"
+_EMPTY_RESPONSE_HEAD = b"HTTP/1.1 %d %s\r\nContent-Length: 0\r\n\r\n"
+_REASONS = {status.value: status.phrase.encode("ascii") for status in HTTPStatus}
+_PREFLIGHT_RESPONSE = (
+    b"HTTP/1.1 204 No Content\r\n"
+    + b"".join(f"{name}: {value}\r\n".encode("ascii") for name, value in app.CORS_HEADERS)
+    + b"\r\n"
+)
+_SERVER_ERROR_RESPONSE = _EMPTY_RESPONSE_HEAD % (
+    HTTPStatus.INTERNAL_SERVER_ERROR, _REASONS[HTTPStatus.INTERNAL_SERVER_ERROR]
+)
+
+
+class HTTPProtocol(asyncio.Protocol):
+    """Serve the Library API over a single client connection.
+
+    ``httptools`` invokes the ``on_*`` callbacks while data is fed to the
+    parser; once a message is complete it is dispatched and the response
+    written straight to the transport.  Keep-alive and pipelined requests
+    are handled by the parser.
+
+    Requests in ``app.PASSWORD_ROUTES`` spend most of their time in the
+    password hash, so they are dispatched on the default executor instead
+    of blocking the loop.  Until one finishes, reading from the connection
+    is paused, and later requests already received wait in ``queued`` (at
+    most one read's worth), so they are still handled and answered in
+    order.
+    """
+
+    def __init__(self) -> None:
+        self.transport: Optional[asyncio.Transport] = None
+        self.parser = httptools.HttpRequestParser(self)
+        self.url = b""
+        self.headers: Dict[str, str] = {}
+        self.body: List[bytes] = []
+        # (request or encoded response, keep-alive) waiting on the executor
+        self.queued: Deque[Tuple[Union[app.Request, bytes], bool]] = deque()
+        self.busy = False
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.transport = None
+        self.queued.clear()
+
+    def data_received(self, data: bytes) -> None:
+        try:
+            self.parser.feed_data(data)
+        except httptools.HttpParserCallbackError:
+            # One of the on_* callbacks below raised; the request was valid
+            traceback.print_exc()
+            self._handle(_SERVER_ERROR_RESPONSE, keep_alive=False)
+        except (httptools.HttpParserError, httptools.HttpParserUpgrade):
+            self._handle(_encode_response(HTTPStatus.BAD_REQUEST, b""), keep_alive=False)
+
+    # httptools parser callbacks
+
+    def on_message_begin(self) -> None:
+        self.url = b""
+        self.headers = {}
+        self.body = []
+
+    def on_url(self, url: bytes) -> None:
+        self.url += url
+
+    def on_header(self, name: bytes, value: bytes) -> None:
+        self.headers[name.decode("latin-1").lower()] = value.decode("latin-1")
+
+    def on_body(self, body: bytes) -> None:
+        self.body.append(body)
+
+    def on_message_complete(self) -> None:
+        if self.transport is None or self.transport.is_closing():
+            return
+        keep_alive = self.parser.should_keep_alive()
+        method = self.parser.get_method().decode("ascii")
+        if method == "OPTIONS":
+            self._handle(_PREFLIGHT_RESPONSE, keep_alive)
+        else:
+            try:
+                url = httptools.parse_url(self.url)
+            except httptools.HttpParserInvalidURLError:
+                self._handle(_encode_response(HTTPStatus.BAD_REQUEST, b""), keep_alive=False)
+                return
+            query = url.query.decode("latin-1") if url.query else ""
+            request = app.Request(method, url.path.decode("latin-1"), query, self.headers, b"".join(self.body))
+            self._handle(request, keep_alive)
+
+    def _handle(self, item: Union[app.Request, bytes], keep_alive: bool) -> None:
+        """Answer a request (or send a ready response) unless the executor is busy."""
+        if self.busy:
+            self.queued.append((item, keep_alive))
+        elif isinstance(item, bytes):
+            self._send(item, keep_alive)
+        elif (item.method, item.path) in app.PASSWORD_ROUTES:
+            self.busy = True
+            self.transport.pause_reading()
+            future = asyncio.get_running_loop().run_in_executor(None, app.dispatch, item)
+            future.add_done_callback(functools.partial(self._executor_done, keep_alive))
+        else:
+            self._send(_encode_response(*app.dispatch(item)), keep_alive)
+
+    def _executor_done(self, keep_alive: bool, future: asyncio.Future) -> None:
+        self.busy = False
+        self._send(_encode_response(*future.result()), keep_alive)
+        while self.queued and not self.busy:
+            self._handle(*self.queued.popleft())
+        if not self.busy and self.transport is not None and not self.transport.is_closing():
+            self.transport.resume_reading()
+
+    def _send(self, response: bytes, keep_alive: bool) -> None:
+        if self.transport is None:
+            return
+        self.transport.write(response)
+        if not keep_alive:
+            self.transport.close()
+            self.queued.clear()
+
+
+def _encode_response(status: int, body: bytes) -> bytes:
+    reason = _REASONS.get(status, b"")
+    if body:
+        return _RESPONSE_HEAD % (status, reason, len(body)) + body
+    return _EMPTY_RESPONSE_HEAD % (status, reason)
+
+
+async def main(host: str = "127.0.0.1", port: int = 8000) -> None:
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(HTTPProtocol, host, port)
+    print(f"Library API server running on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def run(host: str = "127.0.0.1", port: int = 8000) -> None:
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    try:
+        asyncio.run(main(host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    run()
@@ -5,14 +5,24 @@ contains helper functions for loading and saving users, authors, books,
 loans and authentication tokens.  If the relevant data files do not
 exist, they are created with sensible default contents (an empty list
 or dictionary).
+
+Every data file is cached in memory once loaded and is only parsed
+again when it changes on disk.
 """
 
 from __future__ import annotations
 
 import json
 import os
+import threading
+from dataclasses import fields
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # fall back to the standard library json module
+    orjson = None
 
 from models import User, Author, Book, Loan
 
@@ -21,83 +31,515 @@ from models import User, Author, Book, Loan
 DATA_DIR = Path(__file__).resolve().parent / "data"
 DATA_DIR.mkdir(exist_ok=True)
 
+# Serializes writes to the data files.  The threaded server also holds it
+# for the whole of every mutating request so that a handler's
+# load-modify-save sequence is never interleaved with another one.  GET
+# requests read the cached tables without it, so a cached table's rows are
+# never added or removed in place: handlers save a new list and the save
+# replaces the table.  The loans table is the exception, extended in place
+# by borrows and returns; readers of its columns hold the lock too.
+write_lock = threading.RLock()
+
+
+def _to_row(obj: Any) -> Dict[str, Any]:
+    """Return the stored fields of a model instance as a plain dict."""
+    return {f.name: getattr(obj, f.name) for f in fields(obj) if f.init}
+
+
+# JSON codec for the data files and the API, bound once at import.  Both
+# variants write the same UTF-8, two-space indented documents and compact
+# one-line records.  orjson only handles integers from -2**63 to 2**64 - 1
+# (it refuses to write wider ones and reads them back as floats), so the
+# json variant refuses them too: data files never hold them and read the
+# same with and without orjson.
+_JSON_INT_MIN = -(2 ** 63)
+_JSON_INT_MAX = 2 ** 64 - 1
+
+
+def _check_int_range(data: object) -> None:
+    if isinstance(data, int):
+        if not _JSON_INT_MIN <= data <= _JSON_INT_MAX:
+            raise TypeError("Integer exceeds 64-bit range")
+    elif isinstance(data, dict):
+        for value in data.values():
+            _check_int_range(value)
+    elif isinstance(data, (list, tuple)):
+        for value in data:
+            _check_int_range(value)
+
+
+if orjson is not None:
+    loads = orjson.loads
+    dumps = orjson.dumps
+
+    def _dumps_indented(data: object) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+else:
+    loads = json.loads
+
+    def dumps(data: object) -> bytes:
+        """Encode data as compact UTF-8 JSON."""
+        _check_int_range(data)
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def _dumps_indented(data: object) -> bytes:
+        _check_int_range(data)
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _dumps_line(record: object) -> bytes:
+    return dumps(record) + b"\n"
+
+
+def _dumps_rows(rows: List[Any]) -> bytes:
+    """Encode a list as a JSON array holding one compact row per line."""
+    if not rows:
+        return b"[]"
+    return b"[\n" + b",\n".join(map(dumps, rows)) + b"\n]"
+
 
 def _load_json(path: Path, default: object) -> object:
     """Load JSON from the given file.  If it doesn't exist, return default."""
     if not path.exists():
         return default
-    with open(path, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            # If the file is corrupt, return default
-            return default
+    try:
+        return loads(path.read_bytes())
+    except ValueError:
+        # If the file is corrupt, return default
+        return default
 
 
-def _save_json(path: Path, data: object) -> None:
-    """Write data as JSON to the given file atomically."""
+def _save_json(path: Path, data: object, compact: bool = False) -> None:
+    """Write data as JSON to the given file atomically.
+
+    With compact, data (a list) is written one compact row per line
+    instead of indented.
+    """
     tmp_path = path.with_suffix(".tmp")
-    with open(tmp_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, path)
+    raw = _dumps_rows(data) if compact else _dumps_indented(data)
+    with write_lock:
+        tmp_path.write_bytes(raw)
+        os.replace(tmp_path, path)
 
 
-def load_users() -> List[User]:
+# Objects loaded from each data file, keyed by path.  Every entry stores the
+# file's (st_mtime_ns, st_size) at load time, together with that of its
+# journal for journaled files; if either changes on disk the stamp no longer
+# matches and the file is parsed again.  Callers receive the
+# cached objects themselves, so any in-place change must be followed by the
+# matching save_* call, which refreshes the entry and its indexes (or, if
+# the save fails, drops it so that the file is read again).
+_cache: Dict[Path, Tuple[Any, Any]] = {}
+
+
+def _file_stamp(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _stamp(path: Path, journal: Optional[Path] = None) -> Any:
+    if journal is None:
+        return _file_stamp(path)
+    return _file_stamp(path), _file_stamp(journal)
+
+
+def _load_cached(path: Path, build: Callable[[Any], Any], journal: Optional[Path] = None) -> Any:
+    """Return the objects stored in path, re-reading the file only if it changed."""
+    stamp = _stamp(path, journal)
+    entry = _cache.get(path)
+    if entry is not None and stamp is not None and entry[0] == stamp:
+        return entry[1]
+    value = build(_load_json(path, default=[]))
+    if stamp is not None:
+        _cache[path] = (stamp, value)
+    return value
+
+
+def _save_cached(
+    path: Path, value: Any, raw: object, journal: Optional[Path] = None, compact: bool = False
+) -> None:
+    """Persist raw to path and remember value as its loaded form.
+
+    If path has a journal, the snapshot now contains everything in it and
+    the journal is removed.  If the write fails the cache entry is dropped
+    before the error propagates: callers change the cached objects before
+    saving, and the next load must see what is actually on disk.
+    """
+    try:
+        _save_json(path, raw, compact)
+    except BaseException:
+        _cache.pop(path, None)
+        raise
+    if journal is not None:
+        try:
+            os.remove(journal)
+        except FileNotFoundError:
+            pass
+    _cache[path] = (_stamp(path, journal), value)
+
+
+def _append_journal(path: Path, record: Dict[str, Any]) -> None:
+    """Append one JSON record as a single line to a journal file.
+
+    If an earlier append was cut short the file does not end in a newline;
+    the record then starts on a fresh line so that only the torn line is
+    lost when the journal is read back, not this record as well.
+    """
+    line = _dumps_line(record)
+    with write_lock:
+        fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size:
+                os.lseek(fd, -1, os.SEEK_END)
+                if os.read(fd, 1) != b"\n":
+                    line = b"\n" + line
+            view = memoryview(line)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+
+
+def _read_journal(path: Path) -> List[Dict[str, Any]]:
+    """Return the records in a journal file, skipping any torn or blank line."""
+    if not path.exists():
+        return []
+    records = []
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                records.append(loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+class Table:
+    """Records loaded from one data file plus an index of them by id."""
+
+    def __init__(self, items: List[Any]) -> None:
+        self.items = items
+        self.by_id = {item.id: item for item in items}
+        self.max_id = max(self.by_id, default=0)
+        self.orders: Dict[Tuple[str, bool], List[int]] = {}
+
+    def sorted_rows(self, column: str, reverse: bool = False) -> List[int]:
+        """Return every row index ordered by the named column.
+
+        The ordering is computed once per table and column (tables are
+        rebuilt when their file changes); sorting is stable, as with sorted().
+        A cached ordering that does not cover every row was computed before
+        rows were added, and is computed again.
+        """
+        key = (column, reverse)
+        values = getattr(self, column)
+        order = self.orders.get(key)
+        if order is None or len(order) != len(values):
+            order = sorted(range(len(values)), key=values.__getitem__, reverse=reverse)
+            self.orders[key] = order
+        return order
+
+
+class UsersTable(Table):
+    """Users table that also indexes users by lowercased username and email."""
+
+    def __init__(self, items: List[User]) -> None:
+        super().__init__(items)
+        self.by_username = {user.username.lower(): user for user in items}
+        self.by_email = {user.email.lower(): user for user in items}
+
+
+def users_table() -> UsersTable:
+    """Return the cached users together with their indexes."""
     users_path = DATA_DIR / "users.json"
-    raw = _load_json(users_path, default=[])
-    return [User(**item) for item in raw]
+    return _load_cached(users_path, lambda raw: UsersTable([User(**item) for item in raw]))
+
+
+def load_users() -> List[User]:
+    return users_table().items
+
+
+def next_user_id() -> int:
+    return users_table().max_id + 1
 
 
 def save_users(users: List[User]) -> None:
     users_path = DATA_DIR / "users.json"
-    raw = [user.__dict__ for user in users]
-    _save_json(users_path, raw)
+    raw = [_to_row(user) for user in users]
+    _save_cached(users_path, UsersTable(users), raw)
 
 
-def load_authors() -> List[Author]:
+class AuthorsTable(Table):
+    """Authors table that also keeps ids and lowercased names as columns."""
+
+    def __init__(self, items: List[Author]) -> None:
+        super().__init__(items)
+        self.ids = [author.id for author in items]
+        self.names = [author.name.lower() for author in items]
+
+
+def authors_table() -> AuthorsTable:
+    """Return the cached authors together with their column view."""
     authors_path = DATA_DIR / "authors.json"
-    raw = _load_json(authors_path, default=[])
-    return [Author(**item) for item in raw]
+    return _load_cached(authors_path, lambda raw: AuthorsTable([Author(**item) for item in raw]))
+
+
+def load_authors() -> List[Author]:
+    return authors_table().items
+
+
+def authors_by_id() -> Dict[int, Author]:
+    """Return a mapping of author ID to Author."""
+    return authors_table().by_id
 
 
 def save_authors(authors: List[Author]) -> None:
     authors_path = DATA_DIR / "authors.json"
-    raw = [author.__dict__ for author in authors]
-    _save_json(authors_path, raw)
+    raw = [_to_row(author) for author in authors]
+    _save_cached(authors_path, AuthorsTable(authors), raw)
 
 
-def load_books() -> List[Book]:
+class BooksTable(Table):
+    """Books table that also keeps the searchable fields as columns.
+
+    The list endpoint filters and sorts row indices against these plain
+    lists and only looks at the Book objects for the page it returns.
+    """
+
+    def __init__(self, items: List[Book]) -> None:
+        super().__init__(items)
+        self.ids = [book.id for book in items]
+        self.titles = [book.title.lower() for book in items]
+        self.years = [book.publication_year for book in items]
+        self.author_ids = [book.author_id for book in items]
+
+
+def books_table() -> BooksTable:
+    """Return the cached books together with their column view."""
     books_path = DATA_DIR / "books.json"
-    raw = _load_json(books_path, default=[])
-    return [Book(**item) for item in raw]
+    return _load_cached(books_path, lambda raw: BooksTable([Book(**item) for item in raw]))
+
+
+def load_books() -> List[Book]:
+    return books_table().items
+
+
+def books_by_id() -> Dict[int, Book]:
+    """Return a mapping of book ID to Book."""
+    return books_table().by_id
 
 
 def save_books(books: List[Book]) -> None:
     books_path = DATA_DIR / "books.json"
-    raw = [book.__dict__ for book in books]
-    _save_json(books_path, raw)
+    raw = [_to_row(book) for book in books]
+    _save_cached(books_path, BooksTable(books), raw)
 
 
-def load_loans() -> List[Loan]:
+# loans.json is the largest file and only grows, so it is written one
+# compact record per line (like the journal) rather than indented, which
+# roughly halves its size and the bytes parsed when it is reloaded.
+#
+# Borrows and returns are appended to loans.log instead of rewriting
+# loans.json.  The journal is replayed over the snapshot on load and folded
+# back into it once it holds as many records as there are loans (and at
+# least _LOAN_JOURNAL_MIN), keeping the cost of a write O(1) amortised.
+_LOAN_JOURNAL_MIN = 256
+
+
+class LoansTable(Table):
+    """Loans table that also indexes active loans by (user_id, book_id).
+
+    Like the books table it keeps the fields the list endpoints filter and
+    sort on as columns, with timestamps as epoch microseconds so that the
+    overdue check and date ordering are integer comparisons.
+    """
+
+    def __init__(self, items: List[Loan]) -> None:
+        super().__init__(items)
+        self.active = {(loan.user_id, loan.book_id): loan for loan in items if loan.returned_at is None}
+        self.journal_size = 0
+        self.rows = {loan.id: row for row, loan in enumerate(items)}
+        self.ids = [loan.id for loan in items]
+        self.user_ids = [loan.user_id for loan in items]
+        self.borrowed_micros = [loan.borrowed_micros for loan in items]
+        self.due_micros = [loan.due_micros for loan in items]
+        self.returned = [loan.returned_at is not None for loan in items]
+
+    def add(self, loan: Loan) -> None:
+        self.orders.clear()
+        self.rows[loan.id] = len(self.items)
+        self.items.append(loan)
+        self.by_id[loan.id] = loan
+        self.max_id = max(self.max_id, loan.id)
+        self.ids.append(loan.id)
+        self.user_ids.append(loan.user_id)
+        self.borrowed_micros.append(loan.borrowed_micros)
+        self.due_micros.append(loan.due_micros)
+        self.returned.append(loan.returned_at is not None)
+        if loan.returned_at is None:
+            self.active[(loan.user_id, loan.book_id)] = loan
+
+    def apply(self, record: Dict[str, Any]) -> None:
+        """Apply one journal record.  Records already in the snapshot are no-ops."""
+        if record.get("op") == "add":
+            if record["loan"]["id"] not in self.by_id:
+                self.add(Loan(**record["loan"]))
+        elif record.get("op") == "return":
+            loan = self.by_id.get(record["id"])
+            if loan is not None:
+                loan.returned_at = record["returned_at"]
+                self.returned[self.rows[loan.id]] = True
+                key = (loan.user_id, loan.book_id)
+                if self.active.get(key) is loan:
+                    del self.active[key]
+
+
+def _build_loans(raw: List[Dict[str, Any]]) -> LoansTable:
+    table = LoansTable([Loan(**item) for item in raw])
+    records = _read_journal(DATA_DIR / "loans.log")
+    for record in records:
+        table.apply(record)
+    table.journal_size = len(records)
+    return table
+
+
+def loans_table() -> LoansTable:
+    """Return the cached loans together with their column view."""
     loans_path = DATA_DIR / "loans.json"
-    raw = _load_json(loans_path, default=[])
-    return [Loan(**item) for item in raw]
+    return _load_cached(loans_path, _build_loans, journal=DATA_DIR / "loans.log")
+
+
+def load_loans() -> List[Loan]:
+    return loans_table().items
+
+
+def loans_by_id() -> Dict[int, Loan]:
+    """Return a mapping of loan ID to Loan."""
+    return loans_table().by_id
 
 
 def save_loans(loans: List[Loan]) -> None:
     loans_path = DATA_DIR / "loans.json"
-    raw = [loan.__dict__ for loan in loans]
-    _save_json(loans_path, raw)
+    raw = [_to_row(loan) for loan in loans]
+    _save_cached(loans_path, LoansTable(loans), raw, journal=DATA_DIR / "loans.log", compact=True)
+
+
+def _journal_loan_change(table: LoansTable, record: Dict[str, Any]) -> None:
+    # The record is already applied to the cached table; if it cannot be
+    # written, drop the table so that the next load reflects the disk.
+    loans_path = DATA_DIR / "loans.json"
+    journal_path = DATA_DIR / "loans.log"
+    try:
+        _append_journal(journal_path, record)
+    except BaseException:
+        _cache.pop(loans_path, None)
+        raise
+    table.journal_size += 1
+    if table.journal_size >= max(len(table.items), _LOAN_JOURNAL_MIN):
+        save_loans(table.items)
+    else:
+        _cache[loans_path] = (_stamp(loans_path, journal_path), table)
+
+
+def append_loan(loan: Loan) -> None:
+    """Persist a newly created loan."""
+    with write_lock:
+        table = loans_table()
+        table.add(loan)
+        _journal_loan_change(table, {"op": "add", "loan": _to_row(loan)})
+
+
+def mark_returned(loan: Loan) -> None:
+    """Persist the return of a loan whose returned_at has been set."""
+    record = {"op": "return", "id": loan.id, "returned_at": loan.returned_at}
+    with write_lock:
+        table = loans_table()
+        table.apply(record)
+        _journal_loan_change(table, record)
+
+
+# Logins and logouts are journaled to tokens.log the same way.  Since
+# logouts shrink the live set, the journal may grow to
+# _TOKEN_JOURNAL_FACTOR times the number of live tokens (and at least
+# _TOKEN_JOURNAL_MIN records) before it is compacted into tokens.json.
+_TOKEN_JOURNAL_MIN = 256
+_TOKEN_JOURNAL_FACTOR = 4
+
+
+class _TokensTable:
+    """Mapping of token strings to user_id, plus its journal length."""
+
+    def __init__(self, tokens: Dict[str, int]) -> None:
+        self.tokens = tokens
+        self.journal_size = 0
+
+    def apply(self, record: Dict[str, Any]) -> None:
+        """Apply one journal record."""
+        if record.get("op") == "add":
+            self.tokens[record["token"]] = int(record["user_id"])
+        elif record.get("op") == "del":
+            self.tokens.pop(record["token"], None)
+
+
+def _build_tokens(raw: Dict[str, Any]) -> _TokensTable:
+    # Ensure values are integers
+    table = _TokensTable({token: int(user_id) for token, user_id in (raw or {}).items()})
+    records = _read_journal(DATA_DIR / "tokens.log")
+    for record in records:
+        table.apply(record)
+    table.journal_size = len(records)
+    return table
+
+
+def _tokens_table() -> _TokensTable:
+    tokens_path = DATA_DIR / "tokens.json"
+    return _load_cached(tokens_path, _build_tokens, journal=DATA_DIR / "tokens.log")
 
 
 def load_tokens() -> Dict[str, int]:
     """Return a mapping of token strings to user_id."""
-    tokens_path = DATA_DIR / "tokens.json"
-    raw = _load_json(tokens_path, default={})
-    # Ensure values are integers
-    return {token: int(user_id) for token, user_id in raw.items()}
+    return _tokens_table().tokens
 
 
 def save_tokens(tokens: Dict[str, int]) -> None:
     tokens_path = DATA_DIR / "tokens.json"
-    _save_json(tokens_path, tokens)
+    _save_cached(tokens_path, _TokensTable(tokens), tokens, journal=DATA_DIR / "tokens.log")
+
+
+def _journal_token_change(record: Dict[str, Any]) -> None:
+    tokens_path = DATA_DIR / "tokens.json"
+    journal_path = DATA_DIR / "tokens.log"
+    with write_lock:
+        table = _tokens_table()
+        table.apply(record)
+        try:
+            _append_journal(journal_path, record)
+        except BaseException:
+            _cache.pop(tokens_path, None)
+            raise
+        table.journal_size += 1
+        if table.journal_size >= max(_TOKEN_JOURNAL_FACTOR * len(table.tokens), _TOKEN_JOURNAL_MIN):
+            save_tokens(table.tokens)
+        else:
+            _cache[tokens_path] = (_stamp(tokens_path, journal_path), table)
+
+
+def append_token(token: str, user_id: int) -> None:
+    """Persist a newly issued token."""
+    _journal_token_change({"op": "add", "token": token, "user_id": user_id})
+
+
+def remove_token(token: str) -> None:
+    """Persist the revocation of a token."""
+    _journal_token_change({"op": "del", "token": token})
+
+
+def load_auth_context() -> Tuple[Dict[str, int], Dict[int, User]]:
+    """Return the token map and the users-by-id index together.
+
+    Both come from the in-memory caches; only a changed file is read.
+    """
+    return _tokens_table().tokens, users_table().by_id
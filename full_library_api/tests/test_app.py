@@ -0,0 +1,100 @@
+"""Tests for the request handlers in app.py."""
+
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import app
+import auth
+from models import Author, Book
+import storage
+
+
+class AppTestCase(unittest.TestCase):
+    """Point storage at an empty temporary data directory."""
+
+    def setUp(self) -> None:
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir)
+        patcher = mock.patch.object(storage, "DATA_DIR", self.data_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        storage._cache.clear()
+        self.addCleanup(storage._cache.clear)
+        auth._TOKEN_CACHE.clear()
+        self.addCleanup(auth._TOKEN_CACHE.clear)
+
+    def call(self, method: str, path: str, body=None, token: str = "", query: str = ""):
+        headers = {"authorization": "Token " + token} if token else {}
+        raw = json.dumps(body).encode("utf-8") if body is not None else b""
+        status, payload = app.dispatch(app.Request(method, path, query, headers, raw))
+        return status, json.loads(payload) if payload else None
+
+    def staff_token(self) -> str:
+        auth.register_user("staff", "staff@example.com", "secret", "LIBRARIAN")
+        token, _ = auth.login("staff", "secret")
+        return token
+
+
+class ConcurrentCreateTest(AppTestCase):
+    def test_listing_while_books_are_created(self) -> None:
+        storage.save_authors([Author(id=1, name="Author")])
+        storage.save_books([
+            Book(id=i, title="Book %d" % i, publication_year=2000, isbn=str(i), author_id=1,
+                 total_copies=1, available_copies=1)
+            for i in range(1, 5001)
+        ])
+        token = self.staff_token()
+        book = {"title": "New", "publication_year": 2001, "isbn": "x", "author": 1, "total_copies": 1}
+        done = threading.Event()
+        failures = []
+
+        def read() -> None:
+            while not done.is_set():
+                status, _ = self.call("GET", "/api/books/", query="author=1&publication_year=2000")
+                if status != 200:
+                    failures.append(status)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        try:
+            for _ in range(20):
+                status, _ = self.call("POST", "/api/books/", book, token)
+                self.assertEqual(status, 201)
+        finally:
+            done.set()
+            for reader in readers:
+                reader.join()
+        self.assertEqual(failures, [])
+        self.assertEqual(len(storage.load_books()), 5020)
+
+
+class TokenCacheTest(AppTestCase):
+    def test_users_json_edits_apply_to_cached_tokens(self) -> None:
+        token = self.staff_token()
+        self.assertEqual(self.call("POST", "/api/authors/", {"name": "a"}, token)[0], 201)
+        users_path = self.data_dir / "users.json"
+        users = json.loads(users_path.read_bytes())
+        users[0]["role"] = "MEMBER"
+        users_path.write_text(json.dumps(users))
+        self.assertEqual(self.call("POST", "/api/authors/", {"name": "b"}, token)[0], 401)
+        users_path.write_text("[]")
+        self.assertEqual(self.call("POST", "/api/auth/logout/", token=token)[0], 401)
+
+
+class IntFieldTest(unittest.TestCase):
+    def test_rejects_integers_wider_than_64_bits(self) -> None:
+        self.assertEqual(app._int_field("9223372036854775807"), 2 ** 63 - 1)
+        for value in (2 ** 63, -(2 ** 63) - 1, float("inf"), "1e3"):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    app._int_field(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+"""Tests for the storage caches and the loan and token journals."""
+
+import importlib.util
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from models import Author, Loan
+import storage
+
+
+DISK_FULL = OSError(28, "No space left on device")
+
+
+def make_loan(loan_id: int, user_id: int = 1, book_id: int = 0) -> Loan:
+    return Loan(
+        id=loan_id,
+        user_id=user_id,
+        book_id=book_id or loan_id,
+        borrowed_at="2024-01-01T00:00:00",
+        due_at="2024-01-15T00:00:00",
+    )
+
+
+class StorageTestCase(unittest.TestCase):
+    """Point storage at an empty temporary data directory."""
+
+    def setUp(self) -> None:
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir)
+        patcher = mock.patch.object(storage, "DATA_DIR", self.data_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        storage._cache.clear()
+        self.addCleanup(storage._cache.clear)
+
+    def reload(self) -> None:
+        """Forget the cached tables so that the next access reads the files."""
+        storage._cache.clear()
+
+
+class LoanJournalTest(StorageTestCase):
+    def test_replay(self) -> None:
+        for loan_id in (1, 2, 3):
+            storage.append_loan(make_loan(loan_id))
+        loan = storage.loans_by_id()[2]
+        loan.returned_at = "2024-01-05T00:00:00"
+        storage.mark_returned(loan)
+        self.assertFalse((self.data_dir / "loans.json").exists())
+
+        self.reload()
+        table = storage.loans_table()
+        self.assertEqual(table.ids, [1, 2, 3])
+        self.assertEqual(table.returned, [False, True, False])
+        self.assertEqual(table.by_id[2].returned_at, "2024-01-05T00:00:00")
+        self.assertEqual(sorted(table.active), [(1, 1), (1, 3)])
+        self.assertEqual(table.journal_size, 4)
+        self.assertEqual(table.max_id, 3)
+
+    def test_compaction(self) -> None:
+        with mock.patch.object(storage, "_LOAN_JOURNAL_MIN", 4):
+            for loan_id in range(1, 5):
+                storage.append_loan(make_loan(loan_id))
+            self.assertFalse((self.data_dir / "loans.log").exists())
+            self.assertEqual(storage.loans_table().journal_size, 0)
+            rows = json.loads((self.data_dir / "loans.json").read_bytes())
+            self.assertEqual([row["id"] for row in rows], [1, 2, 3, 4])
+
+            storage.append_loan(make_loan(5))
+            self.reload()
+            table = storage.loans_table()
+            self.assertEqual(table.ids, [1, 2, 3, 4, 5])
+            self.assertEqual(table.journal_size, 1)
+
+    def test_records_after_torn_line_survive(self) -> None:
+        storage.append_loan(make_loan(1))
+        with open(self.data_dir / "loans.log", "ab") as f:
+            f.write(b'{"op":"add","lo')
+        self.reload()
+        storage.append_loan(make_loan(2))
+        self.reload()
+        self.assertEqual(sorted(storage.loans_by_id()), [1, 2])
+
+    def test_failed_append_drops_cached_table(self) -> None:
+        storage.append_loan(make_loan(1))
+        with mock.patch.object(storage, "_append_journal", side_effect=DISK_FULL):
+            with self.assertRaises(OSError):
+                storage.append_loan(make_loan(2))
+        self.assertEqual(list(storage.loans_by_id()), [1])
+
+
+class TokenJournalTest(StorageTestCase):
+    def test_replay(self) -> None:
+        storage.append_token("a", 1)
+        storage.append_token("b", 2)
+        storage.remove_token("a")
+        self.reload()
+        self.assertEqual(storage.load_tokens(), {"b": 2})
+
+    def test_compaction(self) -> None:
+        with mock.patch.object(storage, "_TOKEN_JOURNAL_MIN", 3), \
+                mock.patch.object(storage, "_TOKEN_JOURNAL_FACTOR", 2):
+            storage.append_token("a", 1)
+            storage.remove_token("a")
+            storage.append_token("b", 2)
+            self.assertFalse((self.data_dir / "tokens.log").exists())
+            self.reload()
+            self.assertEqual(storage.load_tokens(), {"b": 2})
+
+    def test_records_after_torn_line_survive(self) -> None:
+        storage.append_token("a", 1)
+        with open(self.data_dir / "tokens.log", "ab") as f:
+            f.write(b'{"op":"ad')
+        self.reload()
+        storage.append_token("b", 2)
+        self.reload()
+        self.assertEqual(storage.load_tokens(), {"a": 1, "b": 2})
+
+
+class SaveTest(StorageTestCase):
+    def test_failed_save_drops_cache_entry(self) -> None:
+        storage.save_authors([Author(id=1, name="a")])
+        authors = storage.load_authors()
+        authors.append(Author(id=2, name="b"))
+        with mock.patch.object(storage, "_save_json", side_effect=DISK_FULL):
+            with self.assertRaises(OSError):
+                storage.save_authors(authors)
+        self.assertEqual([author.name for author in storage.load_authors()], ["a"])
+
+    def test_integers_wider_than_64_bits_are_refused(self) -> None:
+        storage.save_authors([Author(id=1, name="a")])
+        wide = Author(id=2 ** 70 + 1, name="b")
+        with self.assertRaises(TypeError):
+            storage.save_authors([*storage.load_authors(), wide])
+        self.assertEqual([author.id for author in storage.load_authors()], [1])
+        self.reload()
+        self.assertEqual([author.id for author in storage.load_authors()], [1])
+
+    def test_64_bit_integers_round_trip(self) -> None:
+        ids = [2 ** 63 - 1, -(2 ** 63), 2 ** 64 - 1]
+        storage.save_authors([Author(id=author_id, name=str(author_id)) for author_id in ids])
+        self.reload()
+        self.assertEqual([author.id for author in storage.load_authors()], ids)
+        self.assertEqual(storage.authors_table().max_id, 2 ** 64 - 1)
+
+    def test_changed_file_is_read_again(self) -> None:
+        storage.save_authors([Author(id=1, name="a")])
+        self.assertEqual(len(storage.load_authors()), 1)
+        (self.data_dir / "authors.json").write_text('[{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]')
+        self.assertEqual([author.id for author in storage.load_authors()], [1, 2])
+
+
+@unittest.skipIf(storage.orjson is None, "orjson is not installed")
+class CodecTest(unittest.TestCase):
+    """The json fallback must accept and refuse the same values as orjson."""
+
+    def test_fallback_matches_orjson(self) -> None:
+        # A separate copy of the module, imported as if orjson were missing
+        spec = importlib.util.spec_from_file_location("storage_without_orjson", storage.__file__)
+        fallback = importlib.util.module_from_spec(spec)
+        with mock.patch.dict(sys.modules, {"orjson": None}):
+            spec.loader.exec_module(fallback)
+        values = ([1, 2 ** 63, -(2 ** 63), 2 ** 64 - 1], {"a": [{"b": 2 ** 64}]}, [-(2 ** 63) - 1], "ü")
+        for value in values:
+            with self.subTest(value=value):
+                try:
+                    expected = storage.orjson.dumps(value)
+                except TypeError:
+                    with self.assertRaises(TypeError):
+                        fallback.dumps(value)
+                else:
+                    self.assertEqual(fallback.dumps(value), expected)
+                    self.assertEqual(fallback.loads(expected), storage.orjson.loads(expected))
+
+
+class SortedRowsTest(StorageTestCase):
+    def test_ordering_covers_added_rows(self) -> None:
+        storage.append_loan(make_loan(2))
+        storage.append_loan(make_loan(1))
+        table = storage.loans_table()
+        self.assertEqual(table.sorted_rows("ids"), [1, 0])
+        # An ordering left over from before the add is not reused
+        stale = table.sorted_rows("ids")
+        storage.append_loan(make_loan(3))
+        table.orders[("ids", False)] = stale
+        self.assertEqual(table.sorted_rows("ids"), [1, 0, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
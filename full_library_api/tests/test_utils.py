@@ -0,0 +1,114 @@
+"""Tests for query parsing, filtering and ordering helpers."""
+
+import random
+import unittest
+from urllib.parse import parse_qs
+
+from models import Author, Book
+from storage import AuthorsTable, BooksTable
+import utils
+
+
+def make_books(count: int, seed: int = 0) -> BooksTable:
+    rng = random.Random(seed)
+    # Few distinct values, so that there are many ties to keep stable
+    return BooksTable([
+        Book(
+            id=book_id,
+            title=rng.choice(["Alpha", "beta", "Gamma", "delta"]),
+            publication_year=rng.randrange(1990, 2000),
+            isbn=str(book_id),
+            author_id=rng.randrange(1, 6),
+            total_copies=1,
+            available_copies=1,
+        )
+        for book_id in rng.sample(range(1, count * 10), count)
+    ])
+
+
+class OrderingTest(unittest.TestCase):
+    """apply_book_order must agree with sorted() for every code path."""
+
+    COLUMNS = {"id": "ids", "title": "titles", "publication_year": "years", "author": "author_ids"}
+
+    def setUp(self) -> None:
+        self.books = make_books(200)
+        rng = random.Random(1)
+        all_rows = range(len(self.books.items))
+        self.selections = {
+            "all": all_rows,
+            "most": [i for i in all_rows if rng.random() < 0.8],
+            "few": [i for i in all_rows if rng.random() < 0.1],
+        }
+
+    def expected(self, rows, column, reverse):
+        values = getattr(self.books, column)
+        return sorted(rows, key=values.__getitem__, reverse=reverse)
+
+    def test_matches_sorted(self) -> None:
+        for name, rows in self.selections.items():
+            for field, column in self.COLUMNS.items():
+                for reverse in (False, True):
+                    ordering = "-" + field if reverse else field
+                    expected = self.expected(rows, column, reverse)
+                    with self.subTest(rows=name, ordering=ordering):
+                        self.assertEqual(list(utils.apply_book_order(self.books, rows, ordering)), expected)
+                        # Twice, so that the cached ordering is used as well
+                        self.assertEqual(list(utils.apply_book_order(self.books, rows, ordering)), expected)
+
+    def test_limit_orders_the_leading_rows(self) -> None:
+        for name, rows in self.selections.items():
+            for limit in (1, 3, 10, 1000):
+                for ordering in ("publication_year", "-publication_year", "title", "-author"):
+                    reverse = ordering.startswith("-")
+                    expected = self.expected(rows, self.COLUMNS[ordering.lstrip("-")], reverse)
+                    with self.subTest(rows=name, limit=limit, ordering=ordering):
+                        result = list(utils.apply_book_order(self.books, rows, ordering, limit))
+                        self.assertEqual(result[:limit], expected[:limit])
+                        self.assertEqual(sorted(result), sorted(rows))
+
+    def test_unknown_ordering_keeps_rows(self) -> None:
+        rows = self.selections["few"]
+        self.assertIs(utils.apply_book_order(self.books, rows, "isbn"), rows)
+        self.assertIs(utils.apply_book_order(self.books, rows, ""), rows)
+
+
+class SearchTest(unittest.TestCase):
+    def test_book_search_matches_title_or_author(self) -> None:
+        authors = AuthorsTable([Author(id=1, name="Ursula Le Guin"), Author(id=2, name="Iain Banks")])
+        books = BooksTable([
+            Book(id=1, title="The Dispossessed", publication_year=1974, isbn="a", author_id=1,
+                 total_copies=1, available_copies=1),
+            Book(id=2, title="Excession", publication_year=1996, isbn="b", author_id=2,
+                 total_copies=1, available_copies=1),
+            Book(id=3, title="The Lathe of Heaven", publication_year=1971, isbn="c", author_id=1,
+                 total_copies=1, available_copies=1),
+        ])
+        self.assertEqual(list(utils.apply_book_search(books, authors, "the")), [0, 2])
+        self.assertEqual(list(utils.apply_book_search(books, authors, "BANKS")), [1])
+        self.assertEqual(list(utils.apply_book_filters(books, range(3), {"author": "1"})), [0, 2])
+        self.assertEqual(list(utils.apply_book_filters(books, range(3), {"publication_year": "x"})), [0, 1, 2])
+
+
+class QueryParamsTest(unittest.TestCase):
+    def test_matches_parse_qs_first_values(self) -> None:
+        for query in ("", "page=2&page_size=5", "search=le+guin&search=x", "a=%41%2B&b=&c", "&&x=1"):
+            expected = {key: values[0] for key, values in parse_qs(query, keep_blank_values=True).items()}
+            with self.subTest(query=query):
+                self.assertEqual(dict(utils.parse_query_params(query)), expected)
+
+    def test_result_is_read_only(self) -> None:
+        with self.assertRaises(TypeError):
+            utils.parse_query_params("page=1")["page"] = "2"
+
+
+class PaginateTest(unittest.TestCase):
+    def test_pages(self) -> None:
+        paged, info = utils.paginate(list(range(25)), 3, 10)
+        self.assertEqual(paged, list(range(20, 25)))
+        self.assertEqual(info, {"count": 25, "page": 3, "page_size": 10, "total_pages": 3})
+        self.assertEqual(utils.page_limit(3, 10), 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,20 +2,39 @@
 
 from __future__ import annotations
 
+import heapq
 import math
-from typing import Any, Dict, Iterable, List, Tuple
-
-from models import Author, Book, Loan
-
-
-def parse_query_params(query_string: str) -> Dict[str, str]:
-    """Parse the query string into a simple key->value dict (only first value considered)."""
-    from urllib.parse import parse_qs
-    params = parse_qs(query_string, keep_blank_values=True)
-    return {k: v[0] for k, v in params.items() if v}
-
-
-def paginate(items: List[Any], page: int, page_size: int) -> Tuple[List[Any], Dict[str, int]]:
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
+from urllib.parse import unquote_plus
+
+from models import utc_now_micros
+from storage import AuthorsTable, BooksTable, LoansTable, Table
+
+
+@lru_cache(maxsize=256)
+def parse_query_params(query_string: str) -> Mapping[str, str]:
+    """Parse the query string into a simple key->value dict (only first value considered).
+
+    Results are memoized per query string, since paginating clients send
+    the same one repeatedly, and returned read-only so that a caller
+    cannot change the cached entry.
+    """
+    params: Dict[str, str] = {}
+    for pair in query_string.split("&"):
+        if not pair:
+            continue
+        key, _, value = pair.partition("=")
+        if "%" in pair or "+" in pair:
+            key = unquote_plus(key)
+            value = unquote_plus(value)
+        if key not in params:
+            params[key] = value
+    return MappingProxyType(params)
+
+
+def paginate(items: Sequence[Any], page: int, page_size: int) -> Tuple[Sequence[Any], Dict[str, int]]:
     """Return a slice of items for the given page and page_size, along with pagination info."""
     total = len(items)
     page = max(page, 1)
@@ -31,121 +50,176 @@ def paginate(items: List[Any], page: int, page_size: int) -> Tuple[List[Any], Di
     }
 
 
-def apply_author_search(authors: List[Author], search: str) -> List[Author]:
+def page_limit(page: int, page_size: int) -> int:
+    """Return how many leading items paginate needs for the given page."""
+    return max(page, 1) * max(page_size, 1)
+
+
+def _order_rows(
+    table: Table, rows: Sequence[int], column: str, reverse: bool, limit: Optional[int] = None
+) -> Sequence[int]:
+    """Order row indices by one of table's columns.
+
+    A small selection is sorted directly, or, if only the first limit rows
+    are needed and that is a small part of it, just those are picked with
+    a heap and the rest follow in their original order.  Otherwise the
+    table's cached ordering of all rows is filtered down to the selection,
+    which is linear and reused by every request until the data changes.
+    """
+    if len(rows) * 4 < len(table.items):
+        values = getattr(table, column)
+        if limit is None or limit * 4 >= len(rows):
+            return sorted(rows, key=values.__getitem__, reverse=reverse)
+        pick = heapq.nlargest if reverse else heapq.nsmallest
+        top = pick(limit, rows, key=values.__getitem__)
+        chosen = set(top)
+        return top + [i for i in rows if i not in chosen]
+    order = table.sorted_rows(column, reverse)
+    if len(rows) == len(order):
+        return order
+    selected = set(rows)
+    return [i for i in order if i in selected]
+
+
+def apply_author_search(authors: AuthorsTable, search: str) -> Sequence[int]:
+    """Return the row indices of authors whose name contains search.
+
+    authors is the table returned by storage.authors_table(); the result
+    is fed to apply_author_order.
+    """
     if not search:
-        return authors
+        return range(len(authors.items))
     term = search.lower()
-    return [a for a in authors if term in a.name.lower()]
+    names = authors.names
+    return [i for i in range(len(names)) if term in names[i]]
 
 
-def apply_author_order(authors: List[Author], ordering: str) -> List[Author]:
+def apply_author_order(
+    authors: AuthorsTable, rows: Sequence[int], ordering: str, limit: Optional[int] = None
+) -> Sequence[int]:
+    """Order rows as requested by ordering; see _order_rows for limit."""
     if not ordering:
-        return authors
+        return rows
     reverse = False
     field = ordering
     if ordering.startswith("-"):
         reverse = True
         field = ordering[1:]
-    key_funcs = {
-        "id": lambda a: a.id,
-        "name": lambda a: a.name.lower(),
+    columns = {
+        "id": "ids",
+        "name": "names",
     }
-    if field not in key_funcs:
-        return authors
-    return sorted(authors, key=key_funcs[field], reverse=reverse)
+    if field not in columns:
+        return rows
+    return _order_rows(authors, rows, columns[field], reverse, limit)
+
 
+def apply_book_search(books: BooksTable, authors: AuthorsTable, search: str) -> Sequence[int]:
+    """Return the row indices of books whose title or author name contains search.
 
-def apply_book_search(books: List[Book], authors: List[Author], search: str) -> List[Book]:
+    books and authors are the tables returned by storage.books_table() and
+    storage.authors_table(); the result is fed to apply_book_filters and
+    apply_book_order.
+    """
     if not search:
-        return books
+        return range(len(books.items))
     term = search.lower()
-    # Prebuild author lookup
-    author_lookup = {a.id: a for a in authors}
-    filtered: List[Book] = []
-    for b in books:
-        if term in b.title.lower():
-            filtered.append(b)
-        else:
-            author = author_lookup.get(b.author_id)
-            if author and term in author.name.lower():
-                filtered.append(b)
-    return filtered
+    matching_authors = {authors.ids[i] for i in apply_author_search(authors, term)}
+    titles = books.titles
+    author_ids = books.author_ids
+    return [i for i in range(len(titles)) if term in titles[i] or author_ids[i] in matching_authors]
 
 
-def apply_book_filters(books: List[Book], params: Dict[str, str]) -> List[Book]:
-    filtered = books
+def apply_book_filters(books: BooksTable, rows: Sequence[int], params: Mapping[str, str]) -> Sequence[int]:
+    filtered = rows
     # Filter by author id
     if "author" in params:
         try:
             author_id = int(params["author"])
-            filtered = [b for b in filtered if b.author_id == author_id]
+            author_ids = books.author_ids
+            filtered = [i for i in filtered if author_ids[i] == author_id]
         except ValueError:
             pass
     # Filter by publication year
     if "publication_year" in params:
         try:
             year = int(params["publication_year"])
-            filtered = [b for b in filtered if b.publication_year == year]
+            years = books.years
+            filtered = [i for i in filtered if years[i] == year]
         except ValueError:
             pass
     return filtered
 
 
-def apply_book_order(books: List[Book], ordering: str) -> List[Book]:
+def apply_book_order(
+    books: BooksTable, rows: Sequence[int], ordering: str, limit: Optional[int] = None
+) -> Sequence[int]:
+    """Order rows as requested by ordering; see _order_rows for limit."""
     if not ordering:
-        return books
+        return rows
     reverse = False
     field = ordering
     if ordering.startswith("-"):
         reverse = True
         field = ordering[1:]
-    key_funcs = {
-        "id": lambda b: b.id,
-        "title": lambda b: b.title.lower(),
-        "publication_year": lambda b: b.publication_year,
-        "author": lambda b: b.author_id,
+    columns = {
+        "id": "ids",
+        "title": "titles",
+        "publication_year": "years",
+        "author": "author_ids",
     }
-    if field not in key_funcs:
-        return books
-    return sorted(books, key=key_funcs[field], reverse=reverse)
+    if field not in columns:
+        return rows
+    return _order_rows(books, rows, columns[field], reverse, limit)
+
 
+def apply_loan_filters(loans: LoansTable, rows: Sequence[int], params: Mapping[str, str]) -> Sequence[int]:
+    """Return the row indices of loans matching the user_id, status and overdue filters.
 
-def apply_loan_filters(loans: List[Loan], params: Dict[str, str]) -> List[Loan]:
-    filtered = loans
+    loans is the table returned by storage.loans_table().
+    """
+    filtered = rows
     # filter by user_id
     if "user_id" in params:
         try:
             uid = int(params["user_id"])
-            filtered = [l for l in filtered if l.user_id == uid]
+            user_ids = loans.user_ids
+            filtered = [i for i in filtered if user_ids[i] == uid]
         except ValueError:
             pass
     # filter by status
+    returned = loans.returned
     if "status" in params:
         status = params["status"].upper()
         if status in {"BORROWED", "RETURNED"}:
             if status == "BORROWED":
-                filtered = [l for l in filtered if l.returned_at is None]
+                filtered = [i for i in filtered if not returned[i]]
             else:
-                filtered = [l for l in filtered if l.returned_at is not None]
-    # filter overdue
+                filtered = [i for i in filtered if returned[i]]
+    # filter overdue: an integer comparison against a single "now"
     if params.get("overdue", "false").lower() == "true":
-        filtered = [l for l in filtered if l.is_overdue()]
+        now = utc_now_micros()
+        due = loans.due_micros
+        filtered = [i for i in filtered if not returned[i] and due[i] < now]
     return filtered
 
 
-def apply_loan_order(loans: List[Loan], ordering: str) -> List[Loan]:
+def apply_loan_order(
+    loans: LoansTable, rows: Sequence[int], ordering: str, limit: Optional[int] = None
+) -> Sequence[int]:
+    """Order rows as requested by ordering; see _order_rows for limit."""
     if not ordering:
-        return loans
+        return rows
     reverse = False
     field = ordering
     if ordering.startswith("-"):
         reverse = True
         field = ordering[1:]
-    key_funcs = {
-        "id": lambda l: l.id,
-        "borrowed_at": lambda l: l.borrowed_at,
-        "due_at": lambda l: l.due_at,
+    columns = {
+        "id": "ids",
+        "borrowed_at": "borrowed_micros",
+        "due_at": "due_micros",
     }
-    if field not in key_funcs:
-        return loans
-    return sorted(loans, key=key_funcs[field], reverse=reverse)
+    if field not in columns:
+        return rows
+    return _order_rows(loans, rows, columns[field], reverse, limit)